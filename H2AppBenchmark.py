@@ -0,0 +1,197 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+from H2AppData import WeatherData, BuildBinaryCache, WEATHER_TABLES, WEATHER_DTYPE
+from H2AppEngine import WindHourly, WindResults, SolarResults, SolarHourly, AnnualSummary, ScaleResults, WindScale, SolarScale
+from H2AppEngine import WindPageResults, SolarPageResults, WIND_WEATHER, SOLAR_WEATHER, DensityTables, BootstrapBands, HybridHourly, HybridSummary
+from H2AppFunctions import H2Prod_array
+from H2AppPlots import WindFigure, SolarFigure
+from H2AppSynthetic import MakeSyntheticWeather
+
+# Timings of the app's hot paths on synthetic databases of several sizes, written to a JSON file so runs can be compared.
+#   startup   -> first city cube straight from SQLite, building the binary cache, first city cube from the cache
+#   per city  -> the wind / solar page computations (H2AppEngine.WindPageResults / SolarPageResults, as main.py's
+#                page worker runs them), and rescaling a computed wind page to another rotor radius
+#   all city  -> every city at once, as for the map markers, plus the H2 aggregation (AnnualSummary) and the wind
+#                speed density curves of every city and year (DensityTables, as stored with the binary cache), and the
+#                P10/P50/P90 H2 bands of every city from resampled days (BootstrapBands)
+#   render    -> updating and drawing the wind / solar page figures on an Agg canvas
+#   memory    -> size of the binary cache on disk and of every city's weather series in memory, per storage dtype
+# Before timing anything, the results on the synthetic database are checked for sign and magnitude (CheckResults).
+# Example:  python H2AppBenchmark.py --sizes 30x4 120x4 30x12 --output benchmark.json --compare baseline.json
+
+DEFAULT_SIZES = ["30x4", "120x4", "30x12"]
+HEIGHT, RADIUS = 80, 60
+AREA, EFFICIENCY = 1, 0.2
+MAX_WINDSPEED = 60 # m/s, above any measured surface wind
+
+
+#-- min / median wall time of fn over repeat calls, setup runs untimed before each call --
+def Timed(fn, repeat=5, setup=None):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"min_s": min(times), "median_s": float(np.median(times)), "repeat": repeat}
+
+#-- Raise ValueError when wind / solar results can't be right: out of their physical range or H2 not following power --
+def CheckResults(Windspeed, Wind, Solar):
+    # Wind and Solar are WindResults / SolarResults of every city (at HEIGHT/RADIUS and AREA/EFFICIENCY)
+    if np.nanmin(Windspeed) < 0 or np.nanmax(Windspeed) > MAX_WINDSPEED:
+        raise ValueError("Wind speeds outside 0-" + str(MAX_WINDSPEED) + " m/s")
+    WindSummary = AnnualSummary(Wind["Windpower"], Wind["WindH2"])
+    SolarSummary = AnnualSummary(Solar["Solarpower"], Solar["SolarH2"])
+    WindLimit = Wind["Windpower"].shape[0]*WindHourly(np.array([float(np.nanmax(Windspeed))]), HEIGHT, RADIUS)[0] # Every hour at the top speed
+    if not np.all((WindSummary["AnnualMWh"] > 0) & (WindSummary["AnnualMWh"] < WindLimit)):
+        raise ValueError("Annual wind power outside 0-" + str(WindLimit) + " MWh")
+    if not np.all(SolarSummary["AnnualMWh"] > 0) or np.nanmin(np.diff(Solar["Solarpower"], axis=0)) < 0:
+        raise ValueError("Solar power is negative (temperatures not in Celsius?)")
+    for name, Summary in (("Wind", WindSummary), ("Solar", SolarSummary)):
+        if not np.allclose(Summary["AnnualH2"], H2Prod_array(Summary["AnnualMWh"]), rtol=1e-4):
+            raise ValueError(name + " H2 does not follow its power")
+
+def ParseSize(size):
+    cities, years = size.lower().split("x")
+    return int(cities), int(years)
+
+def GitCommit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+#-- Page results of the first city, scaled to the benchmark's windmill / panel as the app does before drawing --
+def WindPage(Weather):
+    return ScaleResults(WindPageResults(Weather, [0], HEIGHT), WindScale(RADIUS), fixed=WIND_WEATHER)
+
+def SolarPage(Weather):
+    return ScaleResults(SolarPageResults(Weather, [0]), SolarScale(AREA, EFFICIENCY), fixed=SOLAR_WEATHER)
+
+def Render(figure, canvas, Weather, Results):
+    figure.Update(Weather.Cities().iat[0, 0], Weather.Years(), Results)
+    canvas.draw()
+
+#---- All benchmarks for one database size, returns one record per benchmark ----
+def BenchmarkSize(n_cities, n_years, workdir, repeat=5, dtype=WEATHER_DTYPE):
+    database = os.path.join(workdir, "weather_" + str(n_cities) + "x" + str(n_years) + ".sqlite")
+    cache_dir = database[:-len(".sqlite")] + "_cache_" + dtype
+    if not os.path.exists(database):
+        MakeSyntheticWeather(database, n_cities, 2013, n_years)
+    timings = {}
+
+    # Startup: every run starts from a fresh WeatherData (and for the build, no cache on disk)
+    timings["startup_sqlite_city"] = Timed(lambda: WeatherData(database, None, dtype).Series("windspeed", [0]), repeat)
+    timings["startup_build_cache"] = Timed(lambda: BuildBinaryCache(database, cache_dir, dtype), max(1, repeat//2),
+                                           setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True))
+    timings["startup_build_cache"]["cache_mb"] = sum(os.path.getsize(os.path.join(cache_dir, name)) for name in os.listdir(cache_dir))/1e6
+    timings["startup_cache_city"] = Timed(lambda: WeatherData(database, cache_dir, dtype).Series("windspeed", [0]), repeat)
+
+    Weather = WeatherData(database, cache_dir, dtype)
+    cities = list(range(n_cities))
+    timings["load_all_cities"] = Timed(lambda: [Weather.Series(table, cities) for table in WEATHER_TABLES], repeat)
+    timings["load_all_cities"]["series_mb"] = sum(Weather.Series(table, cities).nbytes for table in WEATHER_TABLES)/1e6
+    timings["wind_city"] = Timed(lambda: WindPageResults(Weather, [0], HEIGHT), repeat)
+    WindBase = WindPageResults(Weather, [0], HEIGHT)
+    timings["wind_city_rescale"] = Timed(lambda: ScaleResults(WindBase, WindScale(RADIUS), fixed=WIND_WEATHER), repeat)
+    timings["solar_city"] = Timed(lambda: SolarPageResults(Weather, [0]), repeat)
+
+    Windspeed, Temperature, Humidity = (Weather.Series(table, cities) for table in WEATHER_TABLES)
+    Latitudes = Weather.Cities().iloc[:, 2].to_numpy(dtype=float)
+    Index = Weather.Index()
+    Wind = WindResults(Windspeed, Index, HEIGHT, RADIUS)
+    ClearSky = Weather.ClearSky(cities)
+    Solar = SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, AREA, EFFICIENCY, ClearSky)
+    CheckResults(Windspeed, Wind, Solar)
+    timings["wind_all_cities"] = Timed(lambda: WindResults(Windspeed, Index, HEIGHT, RADIUS), repeat)
+    timings["solar_all_cities"] = Timed(lambda: SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, AREA, EFFICIENCY, ClearSky), repeat)
+    timings["solar_hourly_direct"] = Timed(lambda: SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, AREA, EFFICIENCY), repeat)
+    timings["density_all_cities"] = Timed(lambda: DensityTables(Windspeed, Index), repeat)
+    timings["bootstrap_all_cities"] = Timed(lambda: BootstrapBands(Wind["WindH2"], Index.lengths, "day"), repeat)
+    timings["hybrid_all_cities"] = Timed(lambda: HybridSummary(*HybridHourly(Windspeed, Temperature, Humidity, Latitudes, Index,
+                                                                             HEIGHT, RADIUS, AREA, EFFICIENCY, ClearSky), Index), repeat)
+    timings["solar_hourly_clearsky"] = Timed(lambda: SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, AREA, EFFICIENCY, ClearSky), repeat)
+    timings["h2_aggregation"] = Timed(lambda: (AnnualSummary(Wind["Windpower"], Wind["WindH2"]),
+                                               AnnualSummary(Solar["Solarpower"], Solar["SolarH2"])), repeat)
+
+    # Rendering reuses one figure per page type, as the app does; the first draw is timed separately
+    for name, FigureClass, Results in (("wind", WindFigure, WindPage(Weather)), ("solar", SolarFigure, SolarPage(Weather))):
+        figure = FigureClass()
+        canvas = FigureCanvasAgg(figure.fig)
+        timings["render_" + name + "_first"] = Timed(lambda: Render(figure, canvas, Weather, Results), 1)
+        timings["render_" + name] = Timed(lambda: Render(figure, canvas, Weather, Results), repeat)
+        figure.Close()
+    Weather.Close()
+
+    return [dict({"benchmark": name, "cities": n_cities, "years": n_years, "dtype": dtype}, **timing) for name, timing in timings.items()]
+
+def RunBenchmarks(sizes=DEFAULT_SIZES, repeat=5, workdir=None, progress=None, dtypes=(WEATHER_DTYPE,)):
+    results = []
+    temp = tempfile.mkdtemp(prefix="h2app_bench_") if workdir is None else workdir
+    try:
+        for size in sizes:
+            for dtype in dtypes:
+                if progress is not None:
+                    progress(size + " " + dtype)
+                results += BenchmarkSize(*ParseSize(size), temp, repeat, dtype)
+    finally:
+        if workdir is None:
+            shutil.rmtree(temp, ignore_errors=True)
+    return {"commit": GitCommit(), "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "repeat": repeat, "results": results}
+
+#-- Median time of each benchmark relative to an earlier run (> 1 is slower) --
+def Compare(report, baseline):
+    before = {(r["benchmark"], r["cities"], r["years"], r.get("dtype")): r["median_s"] for r in baseline["results"]}
+    ratios = []
+    for r in report["results"]:
+        key = (r["benchmark"], r["cities"], r["years"], r.get("dtype"))
+        if key in before and before[key] > 0:
+            ratios.append((key, before[key], r["median_s"], r["median_s"]/before[key]))
+    return ratios
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark loading, computation and rendering on synthetic weather data")
+    parser.add_argument("--sizes", nargs="+", default=DEFAULT_SIZES, help="CITIESxYEARS, e.g. 30x4 120x4")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="benchmark.json")
+    parser.add_argument("--workdir", default=None, help="Keep the synthetic databases here (default: temporary directory)")
+    parser.add_argument("--compare", default=None, help="Earlier benchmark JSON to compare against")
+    parser.add_argument("--dtypes", nargs="+", default=[WEATHER_DTYPE], choices=["float64", "float32", "int16"],
+                        help="Storage dtypes of the binary cache to benchmark")
+    args = parser.parse_args(argv)
+
+    report = RunBenchmarks(args.sizes, args.repeat, args.workdir, lambda size: print("Benchmarking " + size, file=sys.stderr), args.dtypes)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=1)
+
+    for r in report["results"]:
+        memory = "".join("  {:.1f} MB".format(r[key]) for key in ("cache_mb", "series_mb") if key in r)
+        print("{:>8} {:<8} {:<24} {:9.4f} s{}".format(str(r["cities"]) + "x" + str(r["years"]), r["dtype"], r["benchmark"], r["median_s"], memory))
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print("\nCompared with " + args.compare + " (" + str(baseline.get("commit")) + "):")
+        for (name, cities, years, dtype), before, after, ratio in Compare(report, baseline):
+            print("{:>8} {:<8} {:<24} {:9.4f} -> {:9.4f} s  x{:.2f}".format(str(cities) + "x" + str(years), str(dtype), name, before, after, ratio))
+
+
+if __name__ == "__main__":
+    main()
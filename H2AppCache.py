@@ -0,0 +1,69 @@
+from collections import OrderedDict
+
+# Bounded LRU cache for computed city results, so going back to a city with the same parameters is instant.
+# Values are dicts of numpy arrays (as returned by H2AppEngine), and the memory budget counts their nbytes.
+
+
+#-- Memory used by one cached value --
+def ResultBytes(value):
+    if isinstance(value, dict):
+        return sum(ResultBytes(v) for v in value.values())
+    if isinstance(value, (tuple, list)):
+        return sum(ResultBytes(v) for v in value)
+    return getattr(value, "nbytes", 0)
+
+
+class ResultCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, data_version=None):
+        self.max_bytes = max_bytes
+        self.data_version = data_version
+        self.entries = OrderedDict() # Oldest first, most recently used last
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def Get(self, key, default=None):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        self.misses += 1
+        return default
+
+    def Put(self, key, value):
+        size = ResultBytes(value)
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+        if size > self.max_bytes: # Too big to ever fit, don't evict everything else for it
+            return value
+        self.entries[key] = (value, size)
+        self.nbytes += size
+        while self.nbytes > self.max_bytes:
+            self.nbytes -= self.entries.popitem(last=False)[1][1]
+        return value
+
+    def GetOrCompute(self, key, compute):
+        if key in self.entries:
+            return self.Get(key)
+        self.misses += 1
+        return self.Put(key, compute())
+
+    def Invalidate(self):
+        self.entries.clear()
+        self.nbytes = 0
+
+    def SetDataVersion(self, data_version):
+        # Cached results are only valid for the data they were computed from
+        if data_version != self.data_version:
+            self.Invalidate()
+            self.data_version = data_version
+
+    def Stats(self):
+        return {"entries": len(self.entries), "bytes": self.nbytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
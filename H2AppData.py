@@ -0,0 +1,456 @@
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+from H2AppEngine import ClearSkyTable, DensityTables, DensityGrid, YearRows, ScottBandwidth
+from H2AppTiming import Timer
+
+# Lazy access to Datasets/weather.sqlite. Nothing is read until a page asks for it,
+# and only the city columns + years that were asked for are loaded (and then kept for later).
+# A binary copy of the database (one .npy per variable + index.json) is built once next to it and opened with
+# memory mapping, so later launches skip SQLite/pandas entirely and several processes share the same pages.
+# Cities and years are found in the database. Each variable is kept as one [cities, hours] array with every year's
+# hours back to back (no padding for non-leap years), described by a TimeIndex.
+# The clear-sky irradiance table of every city (see H2AppEngine.ClearSkyTable) is stored with it, and so are the wind
+# speed / humidity density curves of every city and year drawn on the city pages (see H2AppEngine.DensityTables).
+# Measurements are stored as float32 by default (or int16 scaled per variable, or float64) and the
+# Year/Month/Day/Hour index is stored once as int16 and shared by every variable.
+# SQLite is opened read only through one connection per WeatherData, after an index on Year, Month, Day, Hour has been
+# added to every weather table (once), so a year or a few city columns can be read without scanning the whole table.
+# weather.sqlite has temperatures in Kelvin. Every read converts them to Celsius in the query (see WEATHER_UNITS),
+# so the series and the binary cache both hand out Celsius, as the Kirmani 2015 correlation expects.
+
+WEATHER_DATABASE = "Datasets/weather.sqlite"
+WEATHER_CACHE_DIR = "Datasets/weather_cache"
+WEATHER_TABLES = ("windspeed", "temperature", "humidity")
+DATETIME_COLS = 4 # Year, Month, Day, Hour columns come before the city columns in every weather table
+CACHE_FORMAT = 6 # Bump when the layout (or units) of the binary cache changes
+WEATHER_UNITS = {"windspeed": "m/s", "temperature": "C", "humidity": "%"} # Units of the series handed out
+SQL_OFFSETS = {"temperature": -273.15} # Added to the stored values to get WEATHER_UNITS (Kelvin -> Celsius)
+WEATHER_DTYPE = "float32" # Measurements in the binary cache: "float64", "float32" or "int16" (scaled per variable)
+INT16_MISSING = -32768 # int16 code of a missing (NULL) measurement
+DENSITY_TABLES = ("windspeed", "humidity") # Variables shown as distributions on the city pages
+DENSITY_CHUNK = 16 # Cities whose hours are expanded into per-year rows at a time while building the density curves
+
+
+#-- Content hash of the database file, only needed when its mtime/size no longer match the cache index --
+def FileHash(path, chunk=1024*1024):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def FileStamp(path):
+    stat = os.stat(path)
+    return {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def ReadCacheIndex(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "index.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+#-- Temporary file next to path, moved over path when the block finishes (removed if it fails) --
+# Every writer gets its own file, so builders running at the same time never write into each other's files,
+# and readers never see a half written one
+@contextlib.contextmanager
+def ReplaceWhenDone(path):
+    name, extension = os.path.splitext(os.path.basename(path))
+    fd, temp = tempfile.mkstemp(prefix=name + ".", suffix=".tmp" + extension, dir=os.path.dirname(path))
+    os.close(fd)
+    os.chmod(temp, 0o644) # mkstemp makes it private to this user
+    try:
+        yield temp
+        os.replace(temp, path)
+    except BaseException:
+        os.remove(temp)
+        raise
+
+def WriteCacheIndex(cache_dir, index):
+    with ReplaceWhenDone(os.path.join(cache_dir, "index.json")) as temp:
+        with open(temp, "w") as f:
+            json.dump(index, f, indent=1)
+
+#-- SQL expression for one city column of a weather table, in the units of WEATHER_UNITS --
+def SqlValue(table, name):
+    if table in SQL_OFFSETS:
+        return '("' + name + '" + ' + repr(SQL_OFFSETS[table]) + ')'
+    return '"' + name + '"'
+
+#-- Index every weather table on its datetime columns, only writes to the database the first time --
+def AddIndexes(database=WEATHER_DATABASE):
+    conn = sqlite3.connect(database)
+    try:
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in WEATHER_TABLES:
+            if table in tables and table + "_time" not in existing:
+                conn.execute("CREATE INDEX " + table + "_time ON " + table + " (Year, Month, Day, Hour)")
+        conn.commit()
+    except sqlite3.OperationalError: # Read-only file or directory, queries still work (without the index)
+        pass
+    finally:
+        conn.close()
+
+#-- Read-only connection, shared by the Tk thread and the page worker thread (WeatherData serializes its use) --
+def ConnectReadOnly(database=WEATHER_DATABASE):
+    uri = "file:" + urllib.request.pathname2url(os.path.abspath(database)) + "?mode=ro"
+    return sqlite3.connect(uri, uri=True, check_same_thread=False)
+
+#-- Is the binary cache in cache_dir still a copy of database, stored as dtype? --
+def CacheIsCurrent(database, cache_dir, dtype=WEATHER_DTYPE):
+    index = ReadCacheIndex(cache_dir)
+    if index is None or index.get("format") != CACHE_FORMAT or index.get("dtype") != dtype:
+        return False
+    if index["source"] == FileStamp(database):
+        return True
+    # mtime/size changed (e.g. the file was copied), only rebuild if the content really changed
+    if index["sha256"] != FileHash(database):
+        return False
+    index["source"] = FileStamp(database)
+    WriteCacheIndex(cache_dir, index)
+    return True
+
+#-- dtype of the series handed out for a storage dtype, int16 is decoded to float32 --
+def SeriesDtype(dtype):
+    return np.float64 if dtype == "float64" else np.float32
+
+#-- int16 scaling of one variable (value = offset + scale*code), spread over its whole range --
+def Int16Encoding(low, high):
+    if not np.isfinite(low) or not np.isfinite(high) or high <= low:
+        return {"dtype": "int16", "offset": float(np.nan_to_num(low)), "scale": 1.0}
+    return {"dtype": "int16", "offset": (high + low)/2, "scale": (high - low)/(2*32767)}
+
+def Encode(values, encoding):
+    if encoding["dtype"] != "int16":
+        return values
+    codes = np.round((values - encoding["offset"])/encoding["scale"])
+    return np.where(np.isnan(codes), INT16_MISSING, np.clip(codes, -32767, 32767)).astype(np.int16)
+
+def Decode(codes, encoding):
+    if encoding["dtype"] != "int16":
+        return codes
+    values = codes.astype(np.float32)*np.float32(encoding["scale"]) + np.float32(encoding["offset"])
+    values[codes == INT16_MISSING] = np.nan
+    return values
+
+#-- Year, Month, Day, Hour of every column of a [cities, hours] series, plus where each year starts and how long it is --
+class TimeIndex:
+    def __init__(self, datetimes):
+        self.datetimes = np.asarray(datetimes).astype(np.int16).reshape(-1, DATETIME_COLS)
+        # A new year starts wherever the Year column changes, so leap and non-leap years can be mixed in any order
+        self.starts = np.flatnonzero(np.diff(self.datetimes[:, 0], prepend=np.nan))
+        self.lengths = np.diff(np.append(self.starts, len(self)))
+        self.years = [int(year) for year in self.datetimes[self.starts, 0]]
+
+    def __len__(self):
+        return self.datetimes.shape[0]
+
+    #-- Hour ranges of the given years (in that order), for slicing [cities, hours] series --
+    def Slices(self, years):
+        positions = [self.years.index(year) for year in years]
+        return [slice(int(self.starts[y]), int(self.starts[y] + self.lengths[y])) for y in positions]
+
+    def Select(self, years):
+        if list(years) == self.years:
+            return self
+        return TimeIndex(np.concatenate([self.datetimes[rows] for rows in self.Slices(years)]))
+
+    #-- Hour number within its own year for every hour (0 = midnight on January 1st) --
+    def HourOfYear(self):
+        return np.arange(len(self)) - np.repeat(self.starts, self.lengths)
+
+
+#---- One-time conversion of weather.sqlite into memory-mappable .npy files ----
+def BuildBinaryCache(database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, dtype=WEATHER_DTYPE):
+    os.makedirs(cache_dir, exist_ok=True)
+    AddIndexes(database) # Before the stamp and hash, so adding them does not make the new cache look out of date
+    stamp = FileStamp(database)
+    sha256 = FileHash(database)
+    source = WeatherData(database, cache_dir=None)
+    years = source.Years()
+    Index = source.Index()
+    latlong = source.Cities()
+
+    columns = {}
+    encoding = {}
+    for table in WEATHER_TABLES:
+        columns[table] = source.TableColumns(table)
+        cities = [SqlValue(table, name) for name in columns[table][DATETIME_COLS:]]
+        names = ", ".join(['"' + name + '"' for name in columns[table][:DATETIME_COLS]] + cities)
+        if dtype == "int16": # One scale per variable, from its smallest and largest value anywhere
+            limits = source.Connect().execute("SELECT " + ", ".join("MIN(" + name + "), MAX(" + name + ")" for name in cities) + " FROM " + table).fetchone()
+            limits = np.array(limits, dtype=np.float64).reshape(-1, 2)
+            encoding[table] = Int16Encoding(np.nanmin(limits[:, 0], initial=np.inf), np.nanmax(limits[:, 1], initial=-np.inf))
+        else:
+            encoding[table] = {"dtype": dtype}
+        # One [cities, hours] array per variable, written year by year so only one year of rows is in memory at a time
+        with ReplaceWhenDone(os.path.join(cache_dir, table + ".npy")) as temp:
+            series = np.lib.format.open_memmap(temp, mode="w+", dtype=dtype, shape=(len(cities), len(Index)))
+            for year, hours in zip(years, Index.Slices(years)):
+                rows = source.Connect().execute("SELECT " + names + " FROM " + table + " WHERE Year = ? ORDER BY rowid", (year,)).fetchall()
+                values = np.array(rows, dtype=np.float64).reshape(len(rows), -1)
+                if values.shape[0] != hours.stop - hours.start or np.any(values[:, :DATETIME_COLS] != Index.datetimes[hours]):
+                    raise ValueError(table + " does not have the same hours as windspeed in " + str(year))
+                series[:, hours] = Encode(values[:, DATETIME_COLS:].T, encoding[table])
+            series.flush()
+            del series
+    source.Close()
+    for name, array in (("time", Index.datetimes), ("clearsky", ClearSkyTable(latlong["Latitude"].to_numpy(dtype=float)))):
+        with ReplaceWhenDone(os.path.join(cache_dir, name + ".npy")) as temp:
+            np.save(temp, array)
+
+    densities = {}
+    for table in DENSITY_TABLES:
+        series = np.load(os.path.join(cache_dir, table + ".npy"), mmap_mode="r")
+        chunks = [list(range(start, min(start + DENSITY_CHUNK, series.shape[0]))) for start in range(0, series.shape[0], DENSITY_CHUNK)]
+        # First pass for the grid shared by every city, then the curves a few cities at a time
+        low, high, bandwidth = np.inf, -np.inf, 0.0
+        for chunk in chunks:
+            Rows = YearRows(Decode(np.asarray(series[chunk]), encoding[table]), Index)
+            low, high = min(low, np.nanmin(Rows)), max(high, np.nanmax(Rows))
+            bandwidth = max(bandwidth, np.nanmax(ScottBandwidth(Rows)))
+        grid = DensityGrid(low, high, bandwidth)
+        tables = [DensityTables(Decode(np.asarray(series[chunk]), encoding[table]), Index, grid) for chunk in chunks]
+        del series
+        densities[table + "_grid"] = grid
+        for key in ("density", "mean", "median", "min", "max"):
+            densities[table + "_" + key] = np.concatenate([t[key] for t in tables]).astype(np.float32)
+    with ReplaceWhenDone(os.path.join(cache_dir, "density.npz")) as temp:
+        np.savez(temp, **densities)
+
+    WriteCacheIndex(cache_dir, {"format": CACHE_FORMAT, "source": stamp, "sha256": sha256, "dtype": dtype, "encoding": encoding, "units": WEATHER_UNITS,
+                                "years": years, "year_hours": Index.lengths.tolist(), "columns": columns, "latlong": latlong.to_dict(orient="list")})
+
+#-- Memory-mapped (read only, zero-copy) view of the binary cache, rebuilt first if the database has changed --
+def OpenBinaryCache(database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, dtype=WEATHER_DTYPE):
+    timer = Timer("data", database=database)
+    current = CacheIsCurrent(database, cache_dir, dtype)
+    timer.Lap("check cache")
+    if not current:
+        BuildBinaryCache(database, cache_dir, dtype)
+        timer.Lap("build cache")
+    index = ReadCacheIndex(cache_dir)
+    arrays = {name: np.load(os.path.join(cache_dir, name + ".npy"), mmap_mode="r") for name in WEATHER_TABLES + ("time", "clearsky")}
+    with np.load(os.path.join(cache_dir, "density.npz")) as densities:
+        arrays["density"] = dict(densities) # Small, read in full
+    timer.Lap("open cache")
+    return index, arrays
+
+#-- WeatherData methods that use the SQLite connection or fill in its caches run one at a time, since city pages load
+# data from a worker thread. Whatever is already loaded (cities, years, index, the memory maps) is read without the lock,
+# so the Tk thread never waits for a page that is loading --
+def Locked(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class WeatherData:
+    def __init__(self, database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, dtype=WEATHER_DTYPE):
+        self.database = database
+        self.cache_dir = cache_dir # None reads straight from SQLite
+        self.dtype = dtype # Storage of the measurements, series come out as SeriesDtype(dtype)
+        self.lock = threading.RLock() # Pages load data on a worker thread while the Tk thread looks up city names
+        self.conn = None
+        self.version = None
+        self.Clear()
+
+    def Clear(self):
+        self.binary = None # (index, memmaps) from OpenBinaryCache
+        self.latlong = None
+        self.years = None
+        self.index = None # TimeIndex of every year
+        self.columns = {} # table -> column names
+        self.datetimes = {} # (table, year) -> [hours, 4 datetime columns]
+        self.loaded = {} # (table, cityNum, year) -> hourly values
+        self.clearsky = {} # cityNum -> [366, 24] clear-sky irradiance
+        self.densities = {} # (table, cities) -> DensityTables of those cities, when there is no binary cache
+
+    @Locked
+    def Connect(self):
+        if self.conn is None:
+            AddIndexes(self.database)
+            self.Version()
+            self.conn = ConnectReadOnly(self.database)
+        return self.conn
+
+    @Locked
+    def Close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.Close()
+
+    #-- Changes whenever the database file is rewritten, anything loaded from an older version is dropped --
+    def Version(self):
+        stat = os.stat(self.database)
+        current = (stat.st_mtime_ns, stat.st_size)
+        if current == self.version:
+            return current
+        return self.NewVersion(current)
+
+    @Locked
+    def NewVersion(self, current):
+        if self.version is not None and current != self.version:
+            self.Close()
+            self.Clear()
+        self.version = current
+        return current
+
+    def Binary(self):
+        binary = self.binary
+        if binary is not None or self.cache_dir is None:
+            return binary
+        return self.OpenBinary()
+
+    @Locked
+    def OpenBinary(self):
+        if self.binary is None:
+            self.Version()
+            self.binary = OpenBinaryCache(self.database, self.cache_dir, self.dtype)
+            self.version = None # Building the cache may have added indexes to the database, the data is the same
+            self.Version()
+            self.LoadCities(), self.LoadYears(), self.LoadIndex() # In the cache index, so ready before any page needs them
+        return self.binary
+
+    def Cities(self):
+        latlong = self.latlong
+        return latlong if latlong is not None else self.LoadCities()
+
+    @Locked
+    def LoadCities(self):
+        if self.latlong is None:
+            if self.Binary() is not None:
+                self.latlong = pd.DataFrame(self.Binary()[0]["latlong"])
+            else:
+                self.latlong = pd.read_sql_query("SELECT * FROM latlong", self.Connect())
+        return self.latlong
+
+    def Years(self):
+        years = self.years
+        return years if years is not None else self.LoadYears()
+
+    @Locked
+    def LoadYears(self):
+        if self.years is None and self.Binary() is not None:
+            self.years = self.Binary()[0]["years"]
+        if self.years is None:
+            rows = self.Connect().execute("SELECT DISTINCT Year FROM windspeed ORDER BY Year").fetchall()
+            self.years = [int(row[0]) for row in rows]
+        return self.years
+
+    #-- Time index of the given years (default all), matching the hours of Series(..., years) --
+    def Index(self, years=None):
+        index = self.index
+        if index is None:
+            index = self.LoadIndex()
+        return index if years is None else index.Select(years)
+
+    @Locked
+    def LoadIndex(self):
+        if self.index is None:
+            if self.Binary() is not None:
+                self.index = TimeIndex(self.Binary()[1]["time"])
+            else:
+                self.index = TimeIndex(np.concatenate([self.DateTimes("windspeed", year) for year in self.Years()]))
+        return self.index
+
+    @Locked
+    def TableColumns(self, table):
+        if table not in WEATHER_TABLES:
+            raise ValueError("Unknown weather table: " + str(table))
+        if table not in self.columns:
+            self.columns[table] = [row[1] for row in self.Connect().execute("PRAGMA table_info(" + table + ")")]
+        return self.columns[table]
+
+    @Locked
+    def DateTimes(self, table, year):
+        if (table, year) not in self.datetimes:
+            names = ", ".join('"' + name + '"' for name in self.TableColumns(table)[:DATETIME_COLS])
+            rows = self.Connect().execute("SELECT " + names + " FROM " + table + " WHERE Year = ? ORDER BY rowid", (year,)).fetchall()
+            self.datetimes[(table, year)] = np.array(rows, dtype=float).reshape(-1, DATETIME_COLS)
+        return self.datetimes[(table, year)]
+
+    #-- Hourly values of one city for one year (cityNum 0 = first city column, same order as latlong) --
+    @Locked
+    def Column(self, table, cityNum, year):
+        return self.Columns(table, [cityNum], year)[0]
+
+    #-- Hourly values [cities, hours] of one year, the cities not loaded yet are read with a single query --
+    @Locked
+    def Columns(self, table, cities, year):
+        missing = [cityNum for cityNum in dict.fromkeys(cities) if (table, cityNum, year) not in self.loaded]
+        if missing:
+            names = ", ".join(SqlValue(table, self.TableColumns(table)[DATETIME_COLS + cityNum]) for cityNum in missing)
+            rows = self.Connect().execute("SELECT " + names + " FROM " + table + " WHERE Year = ? ORDER BY rowid", (year,)).fetchall()
+            values = np.array(rows, dtype=np.float64).reshape(len(rows), len(missing))
+            for cityNum, column in zip(missing, values.T.astype(SeriesDtype(self.dtype))):
+                self.loaded[(table, cityNum, year)] = column
+        return np.stack([self.loaded[(table, cityNum, year)] for cityNum in cities])
+
+    #-- Hourly values [cities, hours] of the given years (default all) back to back, hours as in Index(years) --
+    # The memory maps are sliced without the lock, only SQLite reads (Columns) take it
+    def Series(self, table, cities, years=None):
+        if table not in WEATHER_TABLES:
+            raise ValueError("Unknown weather table: " + str(table))
+        cities = list(cities)
+        Index = self.Index()
+        years = Index.years if years is None else list(years)
+        binary = self.Binary()
+        if binary is not None:
+            series = binary[1][table]
+            encoding = binary[0]["encoding"][table]
+            if years == Index.years:
+                return Decode(np.asarray(series[cities]), encoding) # Each city is one contiguous row of the map, only those rows are read
+            return Decode(np.concatenate([series[cities, hours] for hours in Index.Slices(years)], axis=1), encoding)
+        return np.concatenate([self.Columns(table, cities, year) for year in years], axis=1)
+
+    #-- Clear-sky irradiance tables [cities, 366, 24] of the given cities, see H2AppEngine.ClearSkyTable --
+    def ClearSky(self, cities):
+        cities = list(cities)
+        binary = self.Binary()
+        if binary is not None:
+            return np.asarray(binary[1]["clearsky"][cities])
+        return self.ClearSkyTables(cities)
+
+    @Locked
+    def ClearSkyTables(self, cities):
+        missing = [cityNum for cityNum in cities if cityNum not in self.clearsky]
+        if missing:
+            for cityNum, table in zip(missing, ClearSkyTable(self.Cities()["Latitude"].iloc[missing].to_numpy(dtype=float))):
+                self.clearsky[cityNum] = table
+        return np.stack([self.clearsky[cityNum] for cityNum in cities])
+
+    #-- Density curves and violin statistics of the given cities for every year, see H2AppEngine.DensityTables --
+    def Density(self, table, cities):
+        if table not in DENSITY_TABLES:
+            raise ValueError("No density curves for: " + str(table))
+        cities = list(cities)
+        binary = self.Binary()
+        if binary is not None:
+            densities = binary[1]["density"]
+            tables = {key: densities[table + "_" + key][cities] for key in ("density", "mean", "median", "min", "max")}
+            return dict(tables, grid=densities[table + "_grid"])
+        key = (table, tuple(cities))
+        if key not in self.densities: # Worked out without the lock, Series takes it for the SQLite reads
+            self.densities[key] = DensityTables(self.Series(table, cities), self.Index())
+        return self.densities[key]
@@ -0,0 +1,535 @@
+import contextlib
+
+import numpy as np
+
+from H2AppFunctions import P_wind_array, P_solar_array, H2Prod_array, KirmaniEff_array
+
+# Batch versions of the calculations done in App.WindPowerPage / App.SolarPowerPage.
+# Weather comes in as [cities, hours] series with every year's hours back to back, described by a TimeIndex (see H2AppData).
+# Results come back as dicts of arrays shaped [hours, cities, years] (or [hours, cities] for Avg/StdDev), with the
+# hours running to the end of the longest year, for plotting the years on top of each other. Power and H2 are always
+# float64, whatever the dtype of the weather series (float32 from the default binary cache): running totals in float32
+# lose the hourly steps once they grow large.
+
+HOUR_COL = 3 # Hour column of TimeIndex.datetimes
+SOLSTICE_START = 4105 # Hour in year where Day 172 (June 21st) starts, used for the daily solar trend graph
+CLEARSKY_DAYS = 366
+CLEARSKY_HOURS = 24
+ROLLUP_HOURS = {"month": 730, "week": 168, "day": 24} # Typical hours per bin of each rollup level, coarsest first
+MONTH_DAYS = [31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+DENSITY_POINTS = 512 # Points of the shared density grid of a variable
+DENSITY_CUT = 3 # The grid runs this many bandwidths past the lowest / highest value, like seaborn's kdeplot
+
+
+#-- Split a [cities, hours] series into years: [hours of the longest year, cities, years], zero after a shorter year ends --
+def YearBlocks(Series, Index):
+    Blocks = np.zeros([Index.lengths.max(initial=0), Series.shape[0], len(Index.years)], dtype=Series.dtype)
+    for y, (start, length) in enumerate(zip(Index.starts, Index.lengths)):
+        Blocks[:length, :, y] = Series[:, start:start + length].T
+    return Blocks
+
+#-- Running total over the hours of each year --
+def Cumulate(Hourly, Lengths):
+    # Like the page loops: hour 0 is skipped, and past the end of a shorter year the last total is carried forward
+    hours = np.arange(Hourly.shape[0])[:, None, None]
+    Hourly = np.where((hours >= 1) & (hours < Lengths[None, None, :]), Hourly, 0.0)
+    return np.cumsum(Hourly, axis=0)
+
+#-- Mean and std dev across years, carried forward once the shortest year has ended --
+def YearStats(Cumulative, Lengths):
+    Avg = Cumulative.mean(axis=2)
+    StdDev = Cumulative.std(axis=2) # Population std dev, same as dividing by number of years in the page loops
+    last = Lengths.min() - 1
+    Avg[last + 1:] = Avg[last]
+    StdDev[last + 1:] = StdDev[last]
+    return Avg, StdDev
+
+#-- Year totals [cities, years] of an hourly series, the same as the last row of Cumulate without building it --
+def YearTotals(Hourly, Index):
+    Totals = np.add.reduceat(Hourly, Index.starts, axis=1) if len(Index) else np.zeros([Hourly.shape[0], 0])
+    return Totals - Hourly[:, Index.starts] # Hour 0 is skipped, as in Cumulate
+
+#-- Hourly wind power (MWh) [cities, hours] --
+def WindHourly(Windspeed, height, radius):
+    return P_wind_array(radius, height, Windspeed) / 1000000  # Convert to MWh
+
+#-- Clear-sky irradiance (W/m2) for every day of year and hour, per latitude: [cities, 366, 24] --
+def ClearSkyTable(Latitudes):
+    # Only depends on latitude, so it is worked out once per city instead of for every hour of every year
+    Latitudes = np.asarray(Latitudes, dtype=float)[:, None, None]
+    DOY = np.arange(1, CLEARSKY_DAYS + 1)[None, :, None]
+    Hour = np.arange(CLEARSKY_HOURS)[None, None, :]
+    return P_solar_array(Latitudes, DOY, Hour)
+
+SOLAR_MWH = 1/1000 # kWh -> MWh
+
+#-- Hourly solar power (MWh, like the wind power) [cities, hours] --
+def SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, PanelArea, Efficiency, ClearSky=None):
+    # Efficiency is a fraction (e.g. 0.2), Latitudes has one value per city
+    # ClearSky is the ClearSkyTable of those cities (e.g. WeatherData.ClearSky), worked out here when not given
+    if ClearSky is None:
+        ClearSky = ClearSkyTable(Latitudes)
+    Irradiance = np.take(ClearSky.reshape(ClearSky.shape[0], -1), ClearSkySlots(Index), axis=1)
+    return SolarPower(Irradiance, Windspeed, Temperature, Humidity, PanelArea, Efficiency)
+
+#-- Position of every hour in a flattened ClearSkyTable row --
+def ClearSkySlots(Index):
+    DOY = Index.HourOfYear() // 24 + 1
+    Hour = Index.datetimes[:, HOUR_COL] # Day/Hour come from the Windpower dataset, as in the page
+    return (DOY - 1)*CLEARSKY_HOURS + Hour
+
+#-- Solar power (MWh) from the clear-sky irradiance (W/m2) and the weather of the same hours --
+def SolarPower(Irradiance, Windspeed, Temperature, Humidity, PanelArea, Efficiency):
+    # Wind speed goes into the Kirmani 2015 weather correlation in km/hr, the /1000 gives kWh and SOLAR_MWH MWh
+    Weather = KirmaniEff_array(np.asarray(Windspeed, dtype=np.float64)*3.6, Temperature, Humidity)
+    return (Efficiency*PanelArea*Irradiance/1000)*Weather*SOLAR_MWH
+
+#---- Cumulative power and H2 (tonnes) per year from hourly power, for many cities and years at once ----
+def CumulativeResults(HourlyPower, Index, name):
+    Hourly = YearBlocks(np.asarray(HourlyPower, dtype=np.float64), Index)
+    Power = Cumulate(Hourly, Index.lengths)
+    H2 = Cumulate(H2Prod_array(Hourly), Index.lengths)
+    H2Avg, H2StdDev = YearStats(H2, Index.lengths)
+    return {name + "power": Power, name + "H2": H2, name + "H2Avg": H2Avg, name + "H2StdDev": H2StdDev}
+
+#---- Cumulative Wind power (MWh) and H2 (tonnes) ----
+def WindResults(Windspeed, Index, height, radius):
+    return CumulativeResults(WindHourly(Windspeed, height, radius), Index, "Wind")
+
+#---- Cumulative Solar power (MWh) and H2 (tonnes) ----
+def SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, PanelArea, Efficiency, ClearSky=None):
+    HourlyPower = SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, PanelArea, Efficiency, ClearSky)
+    return CumulativeResults(HourlyPower, Index, "Solar")
+
+#-- Daily solar irradiance trend (W/m2) on the summer solstice, shaped [24 hours, cities] --
+def SolsticeIrradiance(Windspeed, Temperature, Humidity, Latitudes, Index):
+    # Uses the same years as the original solar page, the 3rd year (2015) for hours + wind speed and the
+    # 4th year (2016) for temperature + humidity, or the last year when there are fewer years
+    wind = Index.starts[min(2, len(Index.years) - 1)] + SOLSTICE_START + np.arange(24)
+    weather = Index.starts[min(3, len(Index.years) - 1)] + SOLSTICE_START + np.arange(24)
+    Latitudes = np.asarray(Latitudes, dtype=float)[None, :]
+    Hour = Index.datetimes[wind, HOUR_COL][:, None]
+
+    SolarIrradianceSolstice = P_solar_array(Latitudes, 172, Hour)
+    SolarIrradianceWithWeather = SolarIrradianceSolstice*KirmaniEff_array(np.asarray(Windspeed[:, wind].T, dtype=np.float64)*3.6, Temperature[:, weather].T, Humidity[:, weather].T)
+    return SolarIrradianceSolstice, SolarIrradianceWithWeather
+
+# <editor-fold desc="-- City pages --">
+# Everything drawn on the wind / solar city pages (see H2AppPlots), for any number of cities at once and at scale 1
+# (1 m rotor, 1 m2 panel at 100%), so ScaleResults gives any radius / panel. main.py works out one city on its page
+# worker, H2AppReport every city at once, and H2AppBenchmark times the same calls. Weather is a WeatherData (see
+# H2AppData); a Timer (see H2AppTiming) gets the phases, and a job (see main.PageJob) the progress of the loading.
+
+WIND_ROLLUPS = ("Windspeed", "Windpower", "WindH2Avg", "WindH2StdDev") # Page results drawn from daily/weekly/monthly rollups
+SOLAR_ROLLUPS = ("Solarpower", "SolarH2Avg", "SolarH2StdDev")
+WIND_WEATHER = ("Windspeed", "WindspeedRollups", "WindspeedDensity", "WindH2BandHours") # Wind page results that don't scale with the radius
+SOLAR_WEATHER = ("SolarIrradianceSolstice", "SolarIrradianceWithWeather", "Humidity", "HumidityDensity", "SolarH2BandHours") # Solar page results that don't scale with the panel
+
+def PagePhase(timer, name):
+    return contextlib.nullcontext() if timer is None else timer.Phase(name)
+
+#-- Tell the job how far the loading has got, True once it has been cancelled --
+def PageProgress(job, fraction):
+    if job is None:
+        return False
+    job.Progress(fraction)
+    return job.Cancelled()
+
+#---- Wind page results of the given cities for one hub height, None when the job is cancelled ----
+def WindPageResults(Weather, cities, height, timer=None, job=None):
+    with PagePhase(timer, "load"):
+        Windspeed = Weather.Series("windspeed", cities) # Only these cities' columns are loaded
+    if PageProgress(job, 0.5):
+        return None
+    with PagePhase(timer, "compute"):
+        Index = Weather.Index()
+        Results = WindResults(Windspeed, Index, height, 1)
+        Results["Windspeed"] = YearBlocks(Windspeed, Index)
+        Results["WindspeedDensity"] = Weather.Density("windspeed", cities) # Stored with the binary cache
+    with PagePhase(timer, "rollups"):
+        Results.update(ResultRollups(Results, Index, WIND_ROLLUPS))
+    with PagePhase(timer, "bands"): # P10/P50/P90 of resampled years, see BootstrapBands
+        Results.update(ResultBands(Results, "Wind", Index.lengths))
+    return Results
+
+#---- Solar page results of the given cities, None when the job is cancelled ----
+def SolarPageResults(Weather, cities, timer=None, job=None):
+    with PagePhase(timer, "load"):
+        Latitudes = Weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+        Windspeed = Weather.Series("windspeed", cities)
+        PageProgress(job, 0.25)
+        Temperature = Weather.Series("temperature", cities)
+        PageProgress(job, 0.5)
+        Humidity = Weather.Series("humidity", cities)
+    if PageProgress(job, 0.75):
+        return None
+    with PagePhase(timer, "compute"):
+        Index = Weather.Index()
+        Results = SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, 1, 1, Weather.ClearSky(cities))
+        Results["SolarIrradianceSolstice"], Results["SolarIrradianceWithWeather"] = SolsticeIrradiance(Windspeed, Temperature, Humidity, Latitudes, Index)
+        Results["Humidity"] = YearBlocks(Humidity, Index)
+        Results["HumidityDensity"] = Weather.Density("humidity", cities)
+    with PagePhase(timer, "rollups"):
+        Results.update(ResultRollups(Results, Index, SOLAR_ROLLUPS))
+    with PagePhase(timer, "bands"):
+        Results.update(ResultBands(Results, "Solar", Index.lengths))
+    return Results
+# </editor-fold>
+
+#-- Per city totals at the end of the year: mean power and H2 across years + inter-year spread of H2 --
+def TotalsSummary(FinalPower, FinalH2):
+    # FinalPower, FinalH2 are [cities, years] year totals
+    return {"AnnualMWh": FinalPower.mean(axis=1), "AnnualH2": FinalH2.mean(axis=1),
+            "H2StdDev": FinalH2.std(axis=1), "H2Variability": Variability(FinalH2.std(axis=1), FinalH2.mean(axis=1))}
+
+def Variability(StdDev, Mean):
+    return StdDev / np.maximum(Mean, 1e-12)
+
+def AnnualSummary(Power, H2):
+    return TotalsSummary(Power[-1], H2[-1]) # The cumulative totals are carried forward to the last row
+
+#-- AnnualSummary straight from hourly power [cities, hours], without the per-year cumulative arrays --
+def HourlySummary(HourlyPower, Index):
+    return TotalsSummary(YearTotals(HourlyPower, Index), YearTotals(H2Prod_array(HourlyPower), Index))
+
+# <editor-fold desc="-- Linear parameters --">
+# Wind power goes exactly with radius**2 and solar power with panel area x efficiency, and so do the cumulative
+# totals, H2 and their averages. Results worked out once at scale 1 (radius 1 m, 1 m2 at 100%) give any other
+# radius / area / efficiency by scaling; only a new hub height (log-law wind profile) needs a full calculation.
+
+def WindScale(radius):
+    return radius**2
+
+def SolarScale(PanelArea, Efficiency):
+    return PanelArea*Efficiency
+
+#---- Results for another radius / panel size from results at scale 1, fixed keys (e.g. weather) are passed through ----
+def ScaleResults(Results, factor, fixed=()):
+    Scaled = {}
+    for key, value in Results.items():
+        if key in fixed:
+            Scaled[key] = value
+        elif key.endswith("StdDev") or key.endswith("StdDevRollups"):
+            Scaled[key] = value*abs(factor)
+        else:
+            Scaled[key] = value*factor
+    if "H2Variability" in Results: # Worked out again rather than scaled, it is a ratio
+        Scaled["H2Variability"] = Variability(Scaled["H2StdDev"], Scaled["AnnualH2"])
+    return Scaled
+# </editor-fold>
+
+
+# <editor-fold desc="-- Distributions --">
+# Density curves for the violin (wind speed) and KDE (humidity) panels, for every city and year at once. Each year is
+# linearly binned onto one grid per variable and convolved with its Gaussian kernel by FFT, with Scott's rule bandwidth
+# as in matplotlib's violinplot and seaborn's kdeplot. The curves only depend on the weather, so they are stored
+# with the binary cache (see H2AppData) and the pages draw them without running a KDE.
+
+#-- Every year of a [cities, hours] series as its own row: [cities, years, hours of the longest year], NaN after a shorter year --
+def YearRows(Series, Index):
+    Rows = np.full([Series.shape[0], len(Index.years), Index.lengths.max(initial=0)], np.nan)
+    for y, (start, length) in enumerate(zip(Index.starts, Index.lengths)):
+        Rows[:, y, :length] = Series[:, start:start + length]
+    return Rows
+
+def ScottBandwidth(Rows):
+    n = np.maximum(np.sum(~np.isnan(Rows), axis=-1), 2)
+    return np.nanstd(Rows, axis=-1, ddof=1)*n**(-1/5)
+
+def DensityGrid(low, high, bandwidth, points=DENSITY_POINTS):
+    return np.linspace(low - DENSITY_CUT*bandwidth, high + DENSITY_CUT*bandwidth, points)
+
+#-- Gaussian KDE of every row of Rows [..., hours] on an evenly spaced grid, missing (NaN) values are left out --
+def BinnedDensity(Rows, grid, bandwidth):
+    shape = Rows.shape[:-1]
+    Rows = Rows.reshape(-1, Rows.shape[-1])
+    rows, points = Rows.shape[0], grid.shape[0]
+    step = grid[1] - grid[0]
+    valid = ~np.isnan(Rows)
+    # Linear binning: each value is split between the two grid points around it
+    position = np.clip((np.where(valid, Rows, grid[0]) - grid[0])/step, 0, points - 1)
+    left = np.minimum(position.astype(int), points - 2)
+    right = position - left
+    bins = left + (np.arange(rows)*points)[:, None]
+    counts = (np.bincount(bins[valid], weights=1 - right[valid], minlength=rows*points)
+              + np.bincount(bins[valid] + 1, weights=right[valid], minlength=rows*points)).reshape(rows, points)
+    # Kernel at every lag between two grid points, laid out for a circular convolution long enough not to wrap
+    size = 1 << int(np.ceil(np.log2(2*points)))
+    lags = np.fft.fftfreq(size, 1/size)*step
+    bandwidth = np.maximum(bandwidth.reshape(-1, 1), step)
+    kernel = np.exp(-0.5*(lags[None, :]/bandwidth)**2)/(bandwidth*np.sqrt(2*np.pi))
+    density = np.fft.irfft(np.fft.rfft(counts, size)*np.fft.rfft(kernel, size), size)[:, :points]
+    density = np.maximum(density, 0)/np.maximum(valid.sum(axis=1), 1)[:, None]
+    return density.reshape(shape + (points,))
+
+#---- Density curve [cities, years, grid] and violin statistics [cities, years] of a [cities, hours] series ----
+def DensityTables(Series, Index, grid=None):
+    Rows = YearRows(Series, Index)
+    bandwidth = ScottBandwidth(Rows)
+    if grid is None: # One grid covering every city and year, so the curves can be stored in one array
+        grid = DensityGrid(np.nanmin(Rows), np.nanmax(Rows), np.nanmax(bandwidth))
+    return {"grid": grid, "density": BinnedDensity(Rows, grid, bandwidth), "mean": np.nanmean(Rows, axis=-1),
+            "median": np.nanmedian(Rows, axis=-1), "min": np.nanmin(Rows, axis=-1), "max": np.nanmax(Rows, axis=-1)}
+# </editor-fold>
+
+
+# <editor-fold desc="-- Hybrid sites --">
+# A windmill and a solar panel on the same site feeding one electrolyzer. Both are worked out in one pass over the
+# weather, a few cities at a time: each city's wind speed is read (and converted to float64) once and goes into both
+# the wind power and the Kirmani correlation of the solar power while it is still in the CPU cache.
+
+HYBRID_CHUNK = 8 # Cities worked out together, [cities, hours] float64 temporaries of a few MB
+
+#---- Hourly wind and solar power (MWh) [cities, hours] from one read of the weather ----
+def HybridHourly(Windspeed, Temperature, Humidity, Latitudes, Index, height, radius, PanelArea, Efficiency, ClearSky=None):
+    if ClearSky is None:
+        ClearSky = ClearSkyTable(Latitudes)
+    ClearSky = ClearSky.reshape(ClearSky.shape[0], -1)
+    Slots = ClearSkySlots(Index)
+    Wind = np.empty(Windspeed.shape)
+    Solar = np.empty(Windspeed.shape)
+    for start in range(0, Windspeed.shape[0], HYBRID_CHUNK):
+        rows = slice(start, start + HYBRID_CHUNK)
+        Speed = np.asarray(Windspeed[rows], dtype=np.float64)
+        Wind[rows] = WindHourly(Speed, height, radius)
+        Solar[rows] = SolarPower(np.take(ClearSky[rows], Slots, axis=1), Speed, Temperature[rows], Humidity[rows], PanelArea, Efficiency)
+    return Wind, Solar
+
+#-- Pearson correlation of two [cities, hours] series per city, below 0 when one tends to produce while the other doesn't --
+def HourlyCorrelation(A, B):
+    A = A - A.mean(axis=1, keepdims=True)
+    B = B - B.mean(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.sum(A*B, axis=1)/np.sqrt(np.sum(A*A, axis=1)*np.sum(B*B, axis=1))
+
+#---- Per city summary of a hybrid site, like HourlySummary for the combined output plus how the two sources fit together ----
+# Rated: nameplate wind + solar capacity of the site (MW), for its capacity factor (the model has no rated power of its own)
+def HybridSummary(Wind, Solar, Index, Rated=None):
+    Combined = Wind + Solar
+    Summary = HourlySummary(Combined, Index)
+    Summary["AnnualWindMWh"] = YearTotals(Wind, Index).mean(axis=1)
+    Summary["AnnualSolarMWh"] = YearTotals(Solar, Index).mean(axis=1)
+    Annual = YearTotals(Combined, Index)
+    # Mean output relative to the highest hourly output of the site (hour 0 is skipped)
+    Peak = Combined.max(axis=1, initial=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Summary["PeakRatio"] = np.mean(Annual/(Peak[:, None]*(Index.lengths - 1)), axis=1)
+    if Rated is not None:
+        Summary["CapacityFactor"] = np.mean(Annual/(Rated*(Index.lengths - 1)), axis=1)
+    Summary["Correlation"] = HourlyCorrelation(Wind, Solar)
+    return Summary
+# </editor-fold>
+
+
+# <editor-fold desc="-- Electrolyzer dispatch --">
+# Hour by hour operation of an electrolyzer of limited size (MW) fed by the hourly wind / solar power, instead of turning
+# every MWh into H2. Each hour it takes what it can up to its rated capacity, the surplus charges the battery (if any)
+# and what still doesn't fit is curtailed. Short of capacity, the battery tops it up. Below the minimum load (turndown,
+# as a fraction of capacity) it stays off and its power goes to the battery or is curtailed. Every year starts with an
+# empty battery, and hour 0 is skipped as in Cumulate, so an unlimited electrolyzer gives the same H2 as the pages.
+# All electrolyzer sizes, cities and years are dispatched together. Without a battery there is no loop at all. With one,
+# the state of charge depends on the hour before, so it is carried through the hours of a year in a loop over hours,
+# for all cities and years of one size at once. Everything else (what could go into or come out of the battery, when
+# the electrolyzer can run) is worked out for every hour beforehand, and the totals from the charge afterwards, so the
+# loop only updates the charge: 3 array operations per hour, or 6 with a minimum load. A prefix scan over the
+# hours (the clipped charge steps compose) was tried as well, but with NumPy it takes 7x longer than the loop.
+
+DISPATCH_TOTALS = ("Power", "Load", "Curtailed", "Hours", "H2")
+
+#---- Year totals [sizes, cities, years] of the dispatch of hourly power [cities, hours] (MWh per hour) ----
+def Dispatch(HourlyPower, Index, capacity, min_load=0.0, battery_mwh=0.0, battery_mw=None, efficiency=0.9):
+    # capacity is one electrolyzer size or a list of them (MW); the battery holds battery_mwh, charges and discharges
+    # at up to battery_mw (default: the electrolyzer's capacity), and efficiency is its round trip efficiency
+    capacity = np.asarray(capacity, dtype=float).reshape(-1, 1, 1)
+    if min_load > 0 and not np.all(np.isfinite(capacity)):
+        raise ValueError("An unlimited (inf) electrolyzer has no minimum load, use min_load=0")
+    Power = np.maximum(np.nan_to_num(YearRows(HourlyPower, Index)), 0)[None] # [1, cities, years, hours], nothing below 0
+    Power[..., 0] = 0
+    minimum = min_load*capacity if min_load > 0 else np.zeros_like(capacity)
+    Totals = {"Power": Power.sum(axis=-1)}
+    if battery_mwh <= 0:
+        Direct = np.minimum(Power, capacity[..., None])
+        Load = np.where(Direct >= minimum[..., None], Direct, 0.0)
+        Totals["Load"] = Load.sum(axis=-1)
+        Totals["Hours"] = np.count_nonzero(Load, axis=-1).astype(float)
+        Totals["Curtailed"] = Totals["Power"] - Totals["Load"]
+    else:
+        Hourly = np.ascontiguousarray(np.moveaxis(Power, -1, 0)) # [hours, 1, cities, years], one hour is contiguous
+        valid = (np.arange(Hourly.shape[0])[:, None] < Index.lengths[None, :])[:, None, None, :] # [hours, 1, 1, years]
+        rate = capacity if battery_mw is None else np.full_like(capacity, battery_mw)
+        Totals.update(BatteryDispatch(Hourly, valid, capacity, minimum, rate, battery_mwh, efficiency))
+    Totals["Power"] = np.broadcast_to(Totals["Power"], Totals["Load"].shape)
+    Totals["H2"] = H2Prod_array(Totals["Load"])
+    return Totals
+
+#-- Load, Hours and Curtailed year totals [sizes, cities, years] with a battery, from hourly power [hours, 1, cities, years] --
+def BatteryDispatch(Power, valid, capacity, minimum, rate, battery_mwh, efficiency):
+    # capacity, minimum and rate are [sizes, 1, 1]
+    Direct = np.minimum(Power, capacity)
+    Surplus = np.minimum(Power - Direct, rate) # Could charge the battery, only when the electrolyzer is full
+    Deficit = np.where(valid, np.minimum(capacity - Direct, rate), 0.0) # Could be discharged, only when it is not
+    OnStep = efficiency*Surplus - Deficit
+    OffGain = efficiency*np.minimum(Direct, rate) # Off: the electrolyzer's share goes into the battery instead
+    # Off below this charge: when even the battery can't lift it to the minimum load (inf), or when the charge can't
+    Need = np.where(Direct + Deficit >= minimum, minimum - Direct, np.inf)
+
+    Charge = np.zeros((Need.shape[0] + 1,) + Need.shape[1:]) # State of charge (MWh) at the start of every hour, every year starts empty
+    if np.any(minimum > 0):
+        for h in range(Need.shape[0]):
+            charge = Charge[h]
+            Charge[h + 1] = np.where(charge < Need[h], np.minimum(charge + OffGain[h], battery_mwh), np.clip(charge + OnStep[h], 0, battery_mwh))
+    else: # Never off, since Need is never above 0
+        for h in range(Need.shape[0]):
+            charge = Charge[h + 1]
+            np.add(Charge[h], OnStep[h], out=charge)
+            np.maximum(charge, 0, out=charge)
+            np.minimum(charge, battery_mwh, out=charge)
+    Charge = Charge[:-1]
+
+    Off = Charge < Need
+    room = (battery_mwh - Charge)/efficiency # Input the battery can still take
+    Stored = np.minimum(np.where(Off, np.minimum(Direct, rate), Surplus), room)
+    Load = np.where(Off, 0.0, Direct + np.minimum(Deficit, Charge))
+    return {"Load": Load.sum(axis=0), "Hours": np.count_nonzero(Load, axis=0).astype(float),
+            "Curtailed": (Power - np.where(Off, 0.0, Direct) - Stored).sum(axis=0)}
+
+#-- Per city averages across years [sizes, cities] of Dispatch year totals --
+def DispatchSummary(Totals, Index, capacity):
+    capacity = np.asarray(capacity, dtype=float).reshape(-1, 1, 1)
+    Summary = TotalsSummary(Totals["Load"].reshape(-1, Totals["Load"].shape[-1]), Totals["H2"].reshape(-1, Totals["H2"].shape[-1]))
+    Summary = {key: value.reshape(Totals["H2"].shape[:2]) for key, value in Summary.items()}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        Summary["CapacityFactor"] = np.mean(Totals["Load"]/(capacity*(Index.lengths - 1)), axis=-1) # Hour 0 is skipped
+        Summary["Curtailment"] = np.mean(np.where(Totals["Power"] > 0, Totals["Curtailed"]/Totals["Power"], 0.0), axis=-1)
+    Summary["OperatingHours"] = Totals["Hours"].mean(axis=-1)
+    return Summary
+# </editor-fold>
+
+
+# <editor-fold desc="-- Resampled years --">
+# P10 / P50 / P90 of cumulative H2 over thousands of synthetic years, as a spread for financing beyond the mean +/- 2 std
+# dev of the few years in the database. A synthetic year is put together from whole days or weeks, each taken from a
+# randomly drawn year at the same point of the calendar, so the seasons are kept and so is the weather within a block.
+# Synthetic years are as long as the shortest year. The same draws are used for every city (and, with the same seed,
+# every call), so the bands of different cities and parameters can be compared and cached.
+
+BOOTSTRAP_BLOCK_HOURS = {"day": 24, "week": 168}
+BOOTSTRAP_SAMPLES = 2000
+BOOTSTRAP_PERCENTILES = (10, 50, 90)
+BOOTSTRAP_CHUNK = 8 # Cities whose synthetic years are built at a time, [cities, samples, blocks] is the largest array
+
+#-- What each block of every year adds [cities, years, blocks] to cumulative results [hours, cities, years], and the last hour of each block --
+def BlockSums(Cumulative, Lengths, block_hours):
+    hours = int(np.min(Lengths))
+    ends = np.append(np.arange(block_hours, hours, block_hours), hours)
+    Sums = np.diff(np.asarray(Cumulative, dtype=np.float64)[ends - 1], axis=0, prepend=0)
+    return Sums.transpose(1, 2, 0), ends - 1
+
+#---- Percentiles of the cumulative results of synthetic years, "P10" etc. [blocks, cities] at the end of every block ----
+def BootstrapBands(Cumulative, Lengths, block="week", samples=BOOTSTRAP_SAMPLES, percentiles=BOOTSTRAP_PERCENTILES, seed=0):
+    Sums, hours = BlockSums(Cumulative, Lengths, BOOTSTRAP_BLOCK_HOURS[block])
+    cities, years, blocks = Sums.shape
+    draws = np.random.default_rng(seed).integers(0, years, size=(samples, blocks)) # Year each block is taken from
+    Bands = np.empty([len(percentiles), blocks, cities])
+    for start in range(0, cities, BOOTSTRAP_CHUNK):
+        Chunk = Sums[start:start + BOOTSTRAP_CHUNK]
+        Synthetic = np.cumsum(Chunk[:, draws, np.arange(blocks)], axis=-1) # [cities, samples, blocks]
+        Bands[:, :, start:start + BOOTSTRAP_CHUNK] = np.percentile(Synthetic, percentiles, axis=1).transpose(0, 2, 1)
+    return dict({"P" + str(p): band for p, band in zip(percentiles, Bands)}, hours=hours)
+
+#-- Bootstrap bands of a page's cumulative H2, named like the page results (e.g. WindH2P10, WindH2BandHours) --
+def ResultBands(Results, name, Lengths, block="week", samples=BOOTSTRAP_SAMPLES):
+    Bands = BootstrapBands(Results[name + "H2"], Lengths, block, samples)
+    return {name + "H2" + ("BandHours" if key == "hours" else key): value for key, value in Bands.items()}
+# </editor-fold>
+
+
+# <editor-fold desc="-- Rollups --">
+# Daily, weekly and monthly sum / mean / min / max of [hours, cities, years] results, so plots can draw one min/max pair
+# per day (or coarser) instead of all 8784 hours. Days are rolled up from the hours, weeks (from January 1st) and
+# calendar months from the days. Every year has its own bins, so a leap year's extra day lands in February.
+
+ROLLUP_STATS = ("sum", "min", "max")
+
+#-- First day of every week / month in a year of `days` days --
+def DayStarts(level, days):
+    if level == "week":
+        return np.arange(0, days, 7)
+    lengths = list(MONTH_DAYS)
+    lengths[1] += days > 365 # February 29th
+    starts = np.cumsum([0] + lengths[:-1])
+    return starts[starts < days]
+
+#-- Reduce every year's values [rows, cities, years] into bins starting at the given rows (one array per year) --
+def ReduceBins(Values, starts, rows, stat):
+    ufunc = {"count": np.add, "sum": np.add, "min": np.minimum, "max": np.maximum}[stat]
+    Binned = np.full([max((len(s) for s in starts), default=0), Values.shape[1], Values.shape[2]], np.nan)
+    for y, (s, n) in enumerate(zip(starts, rows)):
+        Binned[:len(s), :, y] = ufunc.reduceat(Values[:n, :, y], s, axis=0)
+    return Binned
+
+class Rollups:
+    def __init__(self, Blocks, Lengths, levels=None):
+        # Blocks is [hours, cities, years] (as from YearBlocks or CumulativeResults), Lengths the hours of each year
+        # levels: level -> {"x": first hour of every bin [bins, years], "bins": [years], stat: [bins, cities, years]},
+        # NaN past the last bin of a shorter year
+        if levels is not None:
+            self.levels = levels
+            return
+        Blocks = np.asarray(Blocks, dtype=np.float64)
+        Lengths = np.asarray(Lengths)
+        days = (Lengths + CLEARSKY_HOURS - 1)//CLEARSKY_HOURS
+        hourStarts = [np.arange(0, length, CLEARSKY_HOURS) for length in Lengths]
+        Day = {stat: ReduceBins(Blocks, hourStarts, Lengths, stat) for stat in ROLLUP_STATS}
+        Day["count"] = ReduceBins(np.ones(Blocks.shape), hourStarts, Lengths, "count")
+        self.levels = {"day": self.Level(Day, hourStarts)}
+        for level in ("week", "month"):
+            dayStarts = [DayStarts(level, n) for n in days]
+            Binned = {stat: ReduceBins(Day[stat], dayStarts, days, stat) for stat in ROLLUP_STATS + ("count",)}
+            self.levels[level] = self.Level(Binned, [s*CLEARSKY_HOURS for s in dayStarts])
+
+    @staticmethod
+    def Level(Binned, hourStarts):
+        x = np.full([Binned["sum"].shape[0], len(hourStarts)], np.nan)
+        for y, s in enumerate(hourStarts):
+            x[:len(s), y] = s
+        with np.errstate(invalid="ignore"):
+            mean = Binned["sum"]/Binned["count"]
+        return {"x": x, "bins": np.array([len(s) for s in hourStarts]), "mean": mean, **{stat: Binned[stat] for stat in ROLLUP_STATS}}
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for level in self.levels.values() for array in level.values())
+
+    #-- Rollups of results scaled by factor (see ScaleResults), min and max swap places for a negative factor --
+    def __mul__(self, factor):
+        levels = {}
+        for name, level in self.levels.items():
+            low, high = (level["min"], level["max"]) if factor >= 0 else (level["max"], level["min"])
+            levels[name] = {"x": level["x"], "bins": level["bins"], "sum": level["sum"]*factor, "mean": level["mean"]*factor,
+                            "min": low*factor, "max": high*factor}
+        return Rollups(None, None, levels)
+
+    #-- Rollups of one city, kept as a city axis of length 1 --
+    def City(self, c):
+        return Rollups(None, None, {name: {key: (value[:, c:c + 1, :] if value.ndim == 3 else value) for key, value in level.items()}
+                                    for name, level in self.levels.items()})
+
+    #-- Coarsest level with at least one bin per two pixels across `span` hours (each bin is drawn as a min and a max
+    # point), None when only the hourly values are fine enough --
+    def Pick(self, span, pixels):
+        for name, hours in ROLLUP_HOURS.items():
+            if name in self.levels and span/hours >= pixels/2:
+                return name
+        return None
+
+#---- Rollups of the given results, for [hours, cities] averages the longest year is used as one year ----
+def ResultRollups(Results, Index, keys):
+    Rolled = {}
+    for key in keys:
+        if Results[key].ndim == 2:
+            Rolled[key + "Rollups"] = Rollups(Results[key][:, :, None], [Results[key].shape[0]])
+        else:
+            Rolled[key + "Rollups"] = Rollups(Results[key], Index.lengths)
+    return Rolled
+# </editor-fold>
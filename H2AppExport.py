@@ -0,0 +1,129 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from H2AppData import WeatherData, WEATHER_DATABASE, WEATHER_CACHE_DIR
+from H2AppEngine import WindHourly, SolarHourly, CumulativeResults, YearBlocks
+from H2AppFunctions import H2Prod_array
+
+# Headless export of hourly + cumulative power and H2 to CSV or Parquet, no display needed.
+# Power is in MWh and H2 in tonnes for wind and solar alike.
+# Cities are processed a few at a time and each chunk is appended to the output, so memory stays bounded.
+# Example:  python H2AppExport.py wind --cities Boston Chicago --years 2015 2016 --height 100 --output wind.csv
+#           python H2AppExport.py solar --area 10 --efficiency 22 --output solar.parquet
+
+EXPORT_COLUMNS = ["City", "Year", "Month", "Day", "Hour", "HourOfYear", "Power_MWh", "CumulativePower_MWh", "H2_t", "CumulativeH2_t"]
+
+
+#-- City numbers from names or numbers given on the command line (all cities if none) --
+def SelectCities(Weather, names=None):
+    allNames = list(Weather.Cities().iloc[:, 0])
+    if not names:
+        return list(range(len(allNames)))
+    cities = []
+    for name in names:
+        if name in allNames:
+            cities.append(allNames.index(name))
+        elif name.isdigit() and int(name) < len(allNames):
+            cities.append(int(name))
+        else:
+            raise ValueError("Unknown city: " + name)
+    return cities
+
+#-- Power + H2 for a chunk of cities, as a long table with one row per city and hour --
+def ExportChunk(Weather, mode, cities, years, params):
+    Index = Weather.Index(years)
+    Windspeed = Weather.Series("windspeed", cities, years)
+    if mode == "wind":
+        Hourly = WindHourly(Windspeed, params["height"], params["radius"])
+    else:
+        Latitudes = Weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+        Hourly = SolarHourly(Windspeed, Weather.Series("temperature", cities, years), Weather.Series("humidity", cities, years),
+                             Latitudes, Index, params["area"], params["efficiency"]/100, Weather.ClearSky(cities))
+    Results = CumulativeResults(Hourly, Index, "")
+    Power, H2 = Results["power"], Results["H2"]
+
+    # Hourly values straight from the engine (float64), with hour 0 skipped as in the cumulative totals.
+    # Padded rows past the end of shorter years are left out
+    HourlyPower = YearBlocks(Hourly, Index)
+    HourlyPower[0] = 0
+    HourlyH2 = H2Prod_array(HourlyPower)
+    names = Weather.Cities().iloc[cities, 0].to_numpy()
+    frames = []
+    for c in range(len(cities)):
+        for y in range(len(years)):
+            start, n = Index.starts[y], Index.lengths[y]
+            frame = pd.DataFrame(Index.datetimes[start:start + n], columns=["Year", "Month", "Day", "Hour"])
+            frame.insert(0, "City", names[c])
+            frame["HourOfYear"] = np.arange(n)
+            frame["Power_MWh"] = HourlyPower[:n, c, y]
+            frame["CumulativePower_MWh"] = Power[:n, c, y]
+            frame["H2_t"] = HourlyH2[:n, c, y]
+            frame["CumulativeH2_t"] = H2[:n, c, y]
+            frames.append(frame)
+    return pd.concat(frames, ignore_index=True)[EXPORT_COLUMNS]
+
+#---- Write every chunk of cities to output as soon as it is computed ----
+def Export(mode, output, cities=None, years=None, params=None, chunk_cities=4, file_format=None,
+           database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, progress=None):
+    params = dict({"height": 80, "radius": 60, "area": 1, "efficiency": 20}, **(params or {}))
+    if file_format is None:
+        file_format = "parquet" if output.endswith(".parquet") else "csv"
+    writer = None
+    if file_format == "parquet":
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow), or use a .csv output")
+
+    try:
+        with WeatherData(database, cache_dir) as Weather: # Closes the SQLite connection even if a chunk fails
+            cities = SelectCities(Weather, cities)
+            years = Weather.Years() if not years else years
+            for start in range(0, len(cities), chunk_cities):
+                chunk = ExportChunk(Weather, mode, cities[start:start + chunk_cities], years, params)
+                if file_format == "parquet":
+                    table = pa.Table.from_pandas(chunk, preserve_index=False)
+                    if writer is None:
+                        writer = pq.ParquetWriter(output, table.schema)
+                    writer.write_table(table) # One row group per chunk
+                else:
+                    chunk.to_csv(output, mode="w" if start == 0 else "a", header=(start == 0), index=False)
+                if progress is not None:
+                    progress(min(start + chunk_cities, len(cities)), len(cities))
+    finally: # The chunks written so far stay readable when a later one fails
+        if writer is not None:
+            writer.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export hourly and cumulative wind/solar power and H2 to CSV or Parquet")
+    parser.add_argument("mode", choices=["wind", "solar"])
+    parser.add_argument("--output", required=True, help="Output file, .csv or .parquet")
+    parser.add_argument("--format", choices=["csv", "parquet"], default=None, help="Default: from the output extension")
+    parser.add_argument("--cities", nargs="+", default=None, help="City names or numbers (default: all)")
+    parser.add_argument("--years", type=int, nargs="+", default=None, help="Years (default: all in the database)")
+    parser.add_argument("--height", type=float, default=80, help="Windmill height (m)")
+    parser.add_argument("--radius", type=float, default=60, help="Rotor radius (m)")
+    parser.add_argument("--area", type=float, default=1, help="Panel area (m2)")
+    parser.add_argument("--efficiency", type=float, default=20, help="PV efficiency (%%)")
+    parser.add_argument("--chunk-cities", type=int, default=4, help="Cities computed and written at a time")
+    parser.add_argument("--database", default=WEATHER_DATABASE)
+    parser.add_argument("--cache-dir", default=WEATHER_CACHE_DIR)
+    parser.add_argument("--no-cache", action="store_true", help="Read straight from SQLite, without the binary cache")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print("\r" + str(done) + "/" + str(total) + " cities", end="", file=sys.stderr)
+
+    params = {"height": args.height, "radius": args.radius, "area": args.area, "efficiency": args.efficiency}
+    Export(args.mode, args.output, args.cities, args.years, params, args.chunk_cities, args.format,
+           args.database, None if args.no_cache else args.cache_dir, progress)
+    print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
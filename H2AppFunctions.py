@@ -40,4 +40,49 @@ def H2Prod(Power_MWh):
 #-- Kirmani 2015 Correlation for Weather effects on Solar Irradiance --
 def KirmaniEff(WindSpeed_kmperhr, Temp_C, RH_Percent):
     K = 1- 0.02914*WindSpeed_kmperhr -0.0076*Temp_C - 0.00705*RH_Percent
-    return K
\ No newline at end of file
+    return min(max(K, 0), 1) #Kept to 0-1: the fit goes negative in strong wind or humid air, and weather never adds light
+
+# <editor-fold desc="-- Array versions (NumPy) --">
+# These mirror the scalar functions above but take whole arrays, e.g. (hours, cities, years) cubes,
+# and return an array with the same (broadcast) shape. Constants are kept identical so results match the scalar versions.
+
+#---- Wind Power from Velocity (m/s) for an array of velocities ----
+def P_wind_array(radius, height, velocity):
+    z0 = 1.0
+    velocity = np.asarray(velocity, dtype=float) * (math.log(height / z0) / math.log(10 / z0))
+
+    Pw = (3.14/2)*1.225*(radius**2)*0.4*0.75*0.9*velocity**3
+    # Same cut-in/cut-out test as P_wind (including its 'or'), applied as a mask so both versions agree
+    Pw = np.where((velocity >= 3) | (velocity <= 25), Pw, 0.0)
+    return Pw #Units of Watts
+
+#--- Solar Power (W/m2) for arrays of Day of Year and Hour ----
+def P_solar_array(Latitude_degree, DOY, Hour):
+    Lat_rad = np.radians(Latitude_degree)
+    DOY = np.asarray(DOY, dtype=float)
+    Hour = np.asarray(Hour, dtype=float)
+    dr = 1+0.33*np.cos((2*3.14/365)*DOY)
+    delta = 0.409*np.sin((2*3.14/365)*DOY-1.39)
+    omega_s = np.radians(15*(Hour-12))
+    E0 = 1353 #W/m2
+
+    with np.errstate(invalid='ignore'): #arccos is NaN during polar day/night, which (as in P_solar) gives no sunlight
+        HalfDay = np.degrees(np.arccos((-1*np.sin(Lat_rad)*np.sin(delta))/(np.cos(Lat_rad)*np.cos(delta))))/15
+    Sunrise = 12 - HalfDay
+    Sunset = 12 + HalfDay
+
+    Ps = (1.2*E0*dr)*(np.sin(Lat_rad)*np.sin(delta) + np.cos(Lat_rad)*np.cos(delta)*np.cos(omega_s))
+    Ps = np.where((Hour > Sunrise) & (Hour < Sunset), Ps, 0.0)
+    return Ps #Units of W/m2
+
+#-- H2 Electrolysis generation (ton/hr) for an array of MWh --
+def H2Prod_array(Power_MWh):
+    H2_kgperhr = np.asarray(Power_MWh, dtype=float)*16.4
+    H2_tonperhr = H2_kgperhr/1000
+    return H2_tonperhr
+
+#-- Kirmani 2015 Correlation for arrays of weather data --
+def KirmaniEff_array(WindSpeed_kmperhr, Temp_C, RH_Percent):
+    K = 1 - 0.02914*np.asarray(WindSpeed_kmperhr, dtype=float) - 0.0076*np.asarray(Temp_C, dtype=float) - 0.00705*np.asarray(RH_Percent, dtype=float)
+    return np.clip(K, 0, 1)
+# </editor-fold>
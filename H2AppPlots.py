@@ -0,0 +1,247 @@
+import numpy as np
+from matplotlib.figure import Figure
+import seaborn as sns
+
+from H2AppTiming import Timer
+
+# The 2x2 city page figures. Each page type keeps one Figure whose artists are updated in place for every city,
+# instead of building (and leaking) a new pyplot figure per click. Uses matplotlib.figure.Figure directly, so the
+# same classes work with FigureCanvasTkAgg in the app or any non-interactive backend.
+# Time series are drawn from the coarsest rollup (see H2AppEngine.Rollups) that still gives every pixel column a point,
+# and switch to a finer one (down to the hours) when an axes is zoomed in. Violins and KDEs are drawn from density curves
+# worked out ahead of time (see WeatherData.Density) when the results carry them.
+
+YEAR_COLORS = ['#2CBDFE', '#5986E4', '#8D46C7', '#B317B1']
+YEAR_MARKERS = ['o', 'H', 'h', '.']
+FIGSIZE = (11, 7.75)
+DPI = 144
+
+
+#-- Min/max decimation: keep the lowest and highest point of each pixel-wide bucket, in time order --
+def MinMaxDecimate(y, buckets):
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    if n <= 2*buckets:
+        return np.arange(n), y
+    size = int(np.ceil(n / buckets))
+    buckets = int(np.ceil(n / size))
+    padded = np.full(buckets*size, np.nan)
+    padded[:n] = y
+    padded = padded.reshape(buckets, size)
+    start = np.arange(buckets)*size
+    low = start + np.nanargmin(padded, axis=1)
+    high = start + np.nanargmax(padded, axis=1)
+    x = np.sort(np.stack([low, high], axis=1), axis=1).ravel()
+    return x, y[x]
+
+#-- Number of pixel columns an axes covers, used as the decimation bucket count --
+def AxesPixels(ax):
+    return max(int(ax.bbox.width), 1)
+
+#-- Rollup level for the hours an axes shows (all of them unless zoomed in), None for hourly --
+def ViewLevel(ax, Rollups, hours):
+    if Rollups is None:
+        return None
+    if ax.get_autoscalex_on():
+        span = hours
+    else:
+        low, high = ax.get_xlim()
+        span = min(high, hours) - max(low, 0)
+    return Rollups.Pick(span, AxesPixels(ax))
+
+#-- Points of one year at a rollup level: the min and the max of every bin, at the bin's first hour --
+def LevelPoints(Level, stat_low, stat_high, c, y):
+    n = Level["bins"][y]
+    x = np.repeat(Level["x"][:n, y], 2)
+    values = np.stack([Level[stat_low][:n, c, y], Level[stat_high][:n, c, y]], axis=1).ravel()
+    return x, values
+
+def StyleAxes(ax, title, xlabel, ylabel, grid_alpha=0.15):
+    ax.set_title(title, color='white')
+    ax.set_xlabel(xlabel, color='white')
+    ax.set_ylabel(ylabel, color='white')
+    ax.grid(color='white', alpha=grid_alpha, linestyle='--')
+    ax.tick_params(labelcolor='white')
+    ax.set_facecolor('#121212')
+
+
+class PageFigure:
+    def __init__(self, suptitle):
+        self.fig = Figure(figsize=FIGSIZE, dpi=DPI, facecolor='#000000')
+        self.ax = self.fig.subplots(nrows=2, ncols=2)
+        self.fig.subplots_adjust(top=0.9, wspace=0.2, hspace=0.25, left=0.075, bottom=0.1, right=0.95) #This helps separate subplots from supertitle
+        self.suptitle_format = suptitle
+        self.title = self.fig.suptitle("", fontsize=18, color='white')
+        self.year_lines = {} # axes -> one line per year, created the first time a year is shown
+        self.band_line = None
+        self.band = None
+        self.percentile_lines = None # P10 / P50 / P90 of resampled years on the H2 axes, see SetPercentiles
+        self.views = {} # axes -> (draw function, level drawn, hours, rollups), redrawn when a zoom needs another level
+
+    #-- Lines per year on an axes, reusing the existing artists and adding more if there are more years --
+    def YearLines(self, ax, years, legend_loc, **kwargs):
+        lines = self.year_lines.setdefault(ax, [])
+        while len(lines) < len(years):
+            y = len(lines)
+            style = {key: (value[y % len(value)] if isinstance(value, list) else value) for key, value in kwargs.items()}
+            lines.append(ax.plot([], [], color=YEAR_COLORS[y % len(YEAR_COLORS)], **style)[0])
+        for line, year in zip(lines, years):
+            line.set_label(str(year))
+            line.set_visible(True)
+        for line in lines[len(years):]:
+            line.set_visible(False)
+        ax.legend(handles=lines[:len(years)], loc=legend_loc)
+        return lines
+
+    #-- Draw with draw(level) at the level that fits the view, and again whenever a zoom changes that level --
+    def View(self, ax, hours, Rollups, draw):
+        if ax not in self.views:
+            ax.callbacks.connect('xlim_changed', self.Rezoom)
+        level = ViewLevel(ax, Rollups, hours)
+        self.views[ax] = (draw, level, hours, Rollups)
+        draw(level)
+        ax.relim()
+        ax.autoscale_view()
+
+    def Rezoom(self, ax):
+        draw, level, hours, Rollups = self.views[ax]
+        new = ViewLevel(ax, Rollups, hours)
+        if new != level:
+            self.views[ax] = (draw, new, hours, Rollups)
+            draw(new)
+            ax.figure.canvas.draw_idle()
+
+    def SetSeries(self, ax, lines, series, Rollups=None):
+        # series is [hours, years], drawn from its rollups (city 0) when they are fine enough for the view,
+        # otherwise each year is decimated to the width of the axes
+        def draw(level):
+            for y, line in enumerate(lines[:series.shape[1]]):
+                if level is None:
+                    line.set_data(*MinMaxDecimate(series[:, y], AxesPixels(ax)))
+                else:
+                    line.set_data(*LevelPoints(Rollups.levels[level], "min", "max", 0, y))
+        self.View(ax, series.shape[0], Rollups, draw)
+
+    def SetBand(self, ax, Avg, StdDev, AvgRollups=None, StdDevRollups=None):
+        # Mean line with a +/- 2 std dev band, the band is rebuilt since fill_between has no set_data
+        if self.band_line is None:
+            self.band_line = ax.plot([], [], color='#018786')[0]
+        def draw(level):
+            if level is None:
+                x, _ = MinMaxDecimate(Avg, AxesPixels(ax))
+                mean, spread = Avg[x], StdDev[x]
+            else:
+                x, mean = LevelPoints(AvgRollups.levels[level], "mean", "mean", 0, 0)
+                _, spread = LevelPoints(StdDevRollups.levels[level], "mean", "mean", 0, 0)
+            self.band_line.set_data(x, mean)
+            if self.band is not None:
+                self.band.remove()
+            self.band = ax.fill_between(x, mean - 2*spread, mean + 2*spread, color="#03DAC6", alpha=0.15) #This creates std dev
+        self.View(ax, Avg.shape[0], AvgRollups if StdDevRollups is not None else None, draw)
+
+    def SetPercentiles(self, ax, hours, P10, P50, P90):
+        # Dashed P50 and dotted P10 / P90 over the mean +/- 2 std dev band, one point per resampled block
+        if self.percentile_lines is None:
+            self.percentile_lines = [ax.plot([], [], color='#FFB74D', linestyle=style, linewidth=1, label=label)[0]
+                                     for style, label in ((':', 'P10 / P90'), ('--', 'P50'), (':', None))]
+            ax.legend(handles=self.percentile_lines[:2], loc='upper left')
+        for line, values in zip(self.percentile_lines, (P10, P50, P90)):
+            line.set_data(hours, values)
+
+    def Close(self):
+        self.fig.clear()
+        self.year_lines = {}
+        self.band_line = None
+        self.band = None
+        self.percentile_lines = None
+        self.views = {}
+
+
+class WindFigure(PageFigure):
+    def __init__(self):
+        super().__init__("{} - Wind Power Data")
+        StyleAxes(self.ax[0, 0], 'Raw Time Series - Wind Velocity', "Hours in Year", "Wind Velocity (m/s)", grid_alpha=0.4)
+        StyleAxes(self.ax[1, 0], 'Cumulative Wind Power Produced', "Hours in Year", "Cumulative Wind Power Generated (MWh)")
+        StyleAxes(self.ax[1, 1], 'Cumulative Hydrogen Electrolyzed', "Hours in Year", "Cumulative Hydrogen Generated (tonnes)")
+
+    def DrawViolins(self, Windspeed, years, Density=None):
+        # Violin plot showing Wind speed distribution per year, redrawn since violins can't be updated in place
+        ax = self.ax[0, 1]
+        ax.cla()
+        if Density is None:
+            violin_parts = ax.violinplot([Windspeed[:, y] for y in range(len(years))], years, widths=0.75, showmeans=True)
+        else: # Same statistics violinplot would work out, each curve cut to the range of that year's values
+            stats = []
+            for y in range(len(years)):
+                inside = (Density["grid"] >= Density["min"][0, y]) & (Density["grid"] <= Density["max"][0, y])
+                stats.append({"coords": Density["grid"][inside], "vals": Density["density"][0, y, inside],
+                              **{key: Density[key][0, y] for key in ("mean", "median", "min", "max")}})
+            violin_parts = ax.violin(stats, years, widths=0.75, showmeans=True)
+        for y, vp in enumerate(violin_parts['bodies']):  # This is necessary to change the violin colours to darkmode colour scheme
+            vp.set_edgecolor('#FFFFFF')
+            vp.set_alpha(0.5)
+            vp.set_facecolor(YEAR_COLORS[y % len(YEAR_COLORS)])
+        StyleAxes(ax, 'Wind Speed Distributions', "", "Wind Velocity (m/s)")
+        ax.set_ylim(0, 15)
+        ax.set_xticks(years)
+
+    def Update(self, cityName, years, Results, timer=None):
+        timer = Timer("figure", page="Wind") if timer is None else timer
+        self.title.set_text(self.suptitle_format.format(cityName))
+        with timer.Phase("lines"):
+            lines = self.YearLines(self.ax[0, 0], years, 'upper right', marker=YEAR_MARKERS, linestyle='none')
+            self.SetSeries(self.ax[0, 0], lines, Results["Windspeed"][:, 0, :], Results.get("WindspeedRollups"))
+            lines = self.YearLines(self.ax[1, 0], years, 'upper left')
+            self.SetSeries(self.ax[1, 0], lines, Results["Windpower"][:, 0, :], Results.get("WindpowerRollups"))
+        with timer.Phase("violins"):
+            self.DrawViolins(Results["Windspeed"][:, 0, :], years, Results.get("WindspeedDensity"))
+        with timer.Phase("band"):
+            if "WindH2P50" in Results:
+                self.SetPercentiles(self.ax[1, 1], Results["WindH2BandHours"], *(Results["WindH2" + p][:, 0] for p in ("P10", "P50", "P90")))
+            self.SetBand(self.ax[1, 1], Results["WindH2Avg"][:, 0], Results["WindH2StdDev"][:, 0],
+                         Results.get("WindH2AvgRollups"), Results.get("WindH2StdDevRollups"))
+
+
+class SolarFigure(PageFigure):
+    def __init__(self):
+        super().__init__("{} - Solar Power Data")
+        ax = self.ax[0, 0]
+        StyleAxes(ax, 'Summer Solstice Solar Irradiance', "Hours", "Irradiance (W/m2)", grid_alpha=0.4)
+        self.solstice = ax.plot([], [], color='#FF5700', label='No Weather Correction')[0]
+        self.solstice_weather = ax.plot([], [], color='#FFD700', label='Kirmani 2015 Weather Correction')[0]
+        ax.legend(loc='lower left')
+        StyleAxes(self.ax[1, 0], 'Cumulative Solar Power Produced', "Hours in Year", "Cumulative Solar Power Generated (MWh)")
+        StyleAxes(self.ax[1, 1], 'Cumulative Hydrogen Electrolyzed', "Hours in Year", "Cumulative Hydrogen Generated (tonnes)")
+
+    def DrawHumidity(self, Humidity, years, Density=None):
+        # KDE per year, redrawn since seaborn's filled curves can't be updated in place
+        ax = self.ax[0, 1]
+        ax.cla()
+        for y, year in enumerate(years):
+            if Density is None:
+                sns.kdeplot(Humidity[:, y], ax=ax, color=YEAR_COLORS[y % len(YEAR_COLORS)], fill=True, alpha=0.3, linewidth=0, label=str(year))
+            else:
+                ax.fill_between(Density["grid"], Density["density"][0, y], color=YEAR_COLORS[y % len(YEAR_COLORS)], alpha=0.3, linewidth=0, label=str(year))
+        StyleAxes(ax, 'Relative Humidity Distribution', "Relative Humidity (%)", "Frequency Density", grid_alpha=0.4)
+        ax.set_xlim(0, 100)
+        ax.set_ylim(bottom=0)
+        ax.legend(loc='upper right')
+
+    def Update(self, cityName, years, Results, timer=None):
+        timer = Timer("figure", page="Solar") if timer is None else timer
+        self.title.set_text(self.suptitle_format.format(cityName))
+        with timer.Phase("lines"):
+            hours = np.arange(Results["SolarIrradianceSolstice"].shape[0])
+            self.solstice.set_data(hours, Results["SolarIrradianceSolstice"][:, 0])
+            self.solstice_weather.set_data(hours, Results["SolarIrradianceWithWeather"][:, 0])
+            self.ax[0, 0].relim()
+            self.ax[0, 0].autoscale_view()
+            lines = self.YearLines(self.ax[1, 0], years, 'upper left')
+            self.SetSeries(self.ax[1, 0], lines, Results["Solarpower"][:, 0, :], Results.get("SolarpowerRollups"))
+        with timer.Phase("kde"):
+            self.DrawHumidity(Results["Humidity"][:, 0, :], years, Results.get("HumidityDensity"))
+        with timer.Phase("band"):
+            if "SolarH2P50" in Results:
+                self.SetPercentiles(self.ax[1, 1], Results["SolarH2BandHours"], *(Results["SolarH2" + p][:, 0] for p in ("P10", "P50", "P90")))
+            self.SetBand(self.ax[1, 1], Results["SolarH2Avg"][:, 0], Results["SolarH2StdDev"][:, 0],
+                         Results.get("SolarH2AvgRollups"), Results.get("SolarH2StdDevRollups"))
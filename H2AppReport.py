@@ -0,0 +1,139 @@
+import argparse
+import multiprocessing
+import os
+import re
+import sys
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from PIL import Image
+
+from H2AppData import WeatherData, WEATHER_DATABASE, WEATHER_CACHE_DIR
+from H2AppEngine import WindPageResults, SolarPageResults, WIND_WEATHER, SOLAR_WEATHER, ScaleResults, WindScale, SolarScale, Rollups
+from H2AppExport import SelectCities
+from H2AppPlots import WindFigure, SolarFigure, DPI
+from H2AppTiming import Timer, ConfigureTimingLog
+
+# Batch report of the city pages: the same 2x2 wind / solar figures as the app, drawn off screen with Agg into one PNG
+# per city and page, plus one PDF with every page. The page results are worked out once for all cities together, with
+# the app's own page calculations (see H2AppEngine.WindPageResults), and each render task gets its city's slice, so the
+# process pool only draws.
+# The main process adds every PNG to the PDF (in city order) as soon as it is saved, while the pool is still drawing,
+# so the PDF pages are images of the PNGs. A report that fails part way leaves no PDF behind.
+# Example:  python H2AppReport.py --output report --pages wind solar --height 100 --radius 50 --processes 8
+
+PAGE_FIGURES = {"wind": WindFigure, "solar": SolarFigure}
+REPORT_PDF = "report.pdf"
+PDF_QUALITY = 90 # JPEG quality of the PDF pages
+
+# One figure per page type in each worker process, reused for every city as the app does
+WorkerFigures = {}
+
+
+#-- One city's slice of all-city page results, with a city axis of length 1 as the figures expect --
+def CityResults(Results, c):
+    City = {}
+    for key, value in Results.items():
+        if isinstance(value, Rollups):
+            City[key] = value.City(c)
+        elif isinstance(value, dict): # Density curves, [cities, years, ...] next to the shared grid
+            City[key] = {name: (array if name == "grid" else array[c:c + 1]) for name, array in value.items()}
+        elif value.ndim == 1: # e.g. the hours of the H2 bands, the same for every city
+            City[key] = value
+        else: # [hours, cities(, years)] or [blocks, cities]
+            City[key] = value[:, c:c + 1]
+    return City
+
+def ReportPath(output, page, cityName, ext=".png"):
+    return os.path.join(output, page + "_" + re.sub(r"[^\w.-]+", "_", cityName) + ext)
+
+
+#---- Draw one city page and save it as a PNG, in a worker process ----
+def RenderPage(task):
+    page, cityName, years, Results, factor, path = task
+    if page not in WorkerFigures:
+        figure = PAGE_FIGURES[page]()
+        WorkerFigures[page] = (figure, FigureCanvasAgg(figure.fig))
+    figure, canvas = WorkerFigures[page]
+    Results = ScaleResults(Results, factor, fixed=WIND_WEATHER if page == "wind" else SOLAR_WEATHER)
+    figure.Update(cityName, years, Results)
+    canvas.draw()
+    Image.fromarray(np.asarray(canvas.buffer_rgba())).save(path, dpi=(DPI, DPI)) # Same as savefig, without drawing again
+    return path
+
+#-- Add a saved page to the end of the PDF (the first page starts it) --
+def AddPdfPage(pdf, path, first):
+    with Image.open(path) as image:
+        image.convert("RGB").save(pdf, append=not first, resolution=DPI, quality=PDF_QUALITY)
+
+#---- PNGs of every city page plus the combined PDF, returns the paths of the PNGs in report order ----
+def Report(output, pages=("wind", "solar"), cities=None, params=None, processes=None, pdf=True,
+           database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, progress=None):
+    params = dict({"height": 80, "radius": 60, "area": 1, "efficiency": 20}, **(params or {}))
+    os.makedirs(output, exist_ok=True)
+    timer = Timer("report", pages=list(pages), **params)
+
+    with WeatherData(database, cache_dir) as Weather:
+        cities = SelectCities(Weather, cities)
+        if not pages or not cities:
+            raise ValueError("No pages to render: select at least one page and one city")
+        names = Weather.Cities().iloc[cities, 0].to_numpy()
+        years = Weather.Years()
+        PageResults, factors = {}, {}
+        if "wind" in pages:
+            with timer.Phase("compute-wind"):
+                PageResults["wind"] = WindPageResults(Weather, cities, params["height"])
+            factors["wind"] = WindScale(params["radius"])
+        if "solar" in pages:
+            with timer.Phase("compute-solar"):
+                PageResults["solar"] = SolarPageResults(Weather, cities)
+            factors["solar"] = SolarScale(params["area"], params["efficiency"]/100)
+
+    # Tasks in report order: every page of a city before the next city. Each slice is only sent to the worker drawing it
+    tasks = ((page, names[c], years, CityResults(PageResults[page], c), factors[page], ReportPath(output, page, names[c]))
+             for c in range(len(cities)) for page in pages)
+    total = len(cities)*len(pages)
+    paths = []
+    with timer.Phase("render"):
+        with multiprocessing.Pool(min(processes or os.cpu_count(), total)) as pool:
+            pdfPath = os.path.join(output, REPORT_PDF)
+            try:
+                for path in pool.imap(RenderPage, tasks): # In order, so the PDF pages follow the cities
+                    if pdf:
+                        AddPdfPage(pdfPath, path, first=not paths)
+                    paths.append(path)
+                    if progress is not None:
+                        progress(len(paths), total)
+            except BaseException:
+                if pdf and os.path.exists(pdfPath): # Not a report of every city, so no PDF at all
+                    os.remove(pdfPath)
+                raise
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the wind/solar page of every city to PNGs and one combined PDF")
+    parser.add_argument("--output", default="report", help="Output directory")
+    parser.add_argument("--pages", nargs="+", choices=["wind", "solar"], default=["wind", "solar"])
+    parser.add_argument("--cities", nargs="+", default=None, help="City names or numbers (default: all)")
+    parser.add_argument("--height", type=float, default=80, help="Windmill height (m)")
+    parser.add_argument("--radius", type=float, default=60, help="Rotor radius (m)")
+    parser.add_argument("--area", type=float, default=1, help="Panel area (m2)")
+    parser.add_argument("--efficiency", type=float, default=20, help="PV efficiency (%%)")
+    parser.add_argument("--processes", type=int, default=None, help="Render processes (default: all cores)")
+    parser.add_argument("--no-pdf", action="store_true", help="Only write the PNGs")
+    parser.add_argument("--database", default=WEATHER_DATABASE)
+    parser.add_argument("--cache-dir", default=WEATHER_CACHE_DIR)
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print("\r" + str(done) + "/" + str(total) + " pages", end="", file=sys.stderr)
+
+    ConfigureTimingLog() # Phase timings go to $H2APP_TIMING_LOG when it is set
+    params = {"height": args.height, "radius": args.radius, "area": args.area, "efficiency": args.efficiency}
+    Report(args.output, args.pages, args.cities, params, args.processes, not args.no_pdf, args.database, args.cache_dir, progress)
+    print(file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import argparse
+import itertools
+import multiprocessing
+import os
+import sys
+
+import pandas as pd
+
+from H2AppData import WeatherData, WEATHER_DATABASE, WEATHER_CACHE_DIR
+from H2AppEngine import WindHourly, SolarHourly, HourlySummary, ScaleResults, WindScale, SolarScale, Dispatch, DispatchSummary
+from H2AppEngine import CumulativeResults, BootstrapBands, HybridHourly, HybridSummary
+
+# Parameter sweeps for windmill height x rotor radius and panel area x PV efficiency.
+# Every combination is evaluated for every city on a process pool, and the rows are collected into a ranked table.
+# The electrolyzer sweep sizes the electrolyzer (and battery) behind a windmill or panel, see H2AppEngine.Dispatch.
+# Example:  python H2AppSweep.py wind --heights 60 80 100 --radii 40 50 60 --output wind_sweep.csv
+#           python H2AppSweep.py electrolyzer --capacities 1 2 4 8 --min-loads 0.1 0.2 --batteries 0 10
+# The hybrid sweep puts a windmill and a panel on every site and ranks the combined output (see H2AppEngine.HybridSummary).
+#           python H2AppSweep.py hybrid --heights 80 100 --radii 60 --areas 5000 10000 --efficiencies 20
+# --samples N adds the P10/P50/P90 annual H2 of N resampled years per city to the wind / solar sweeps (see H2AppEngine.BootstrapBands).
+
+SWEEP_COLUMNS = ["City", "AnnualMWh", "AnnualH2", "H2StdDev", "H2Variability"]
+DISPATCH_COLUMNS = SWEEP_COLUMNS + ["CapacityFactor", "Curtailment", "OperatingHours"]
+BAND_COLUMNS = SWEEP_COLUMNS + ["AnnualH2P10", "AnnualH2P50", "AnnualH2P90"]
+HYBRID_COLUMNS = SWEEP_COLUMNS + ["AnnualWindMWh", "AnnualSolarMWh", "PeakRatio", "Correlation"]
+
+# Weather series for all cities, loaded once per worker process (shared from the memory-mapped cache when available)
+WorkerData = {}
+
+
+def InitWorker(database, cache_dir, mode, samples=0, block="week"):
+    WorkerData["Samples"], WorkerData["Block"] = samples, block
+    Weather = WeatherData(database, cache_dir)
+    cities = list(range(Weather.Cities().shape[0]))
+    WorkerData["Cities"] = Weather.Cities()
+    WorkerData["Index"] = Weather.Index()
+    WorkerData["windspeed"] = Weather.Series("windspeed", cities)
+    if mode in ("solar", "hybrid"):
+        WorkerData["temperature"] = Weather.Series("temperature", cities)
+        WorkerData["humidity"] = Weather.Series("humidity", cities)
+        WorkerData["ClearSky"] = Weather.ClearSky(cities)
+
+def SummaryRows(Summary, params, columns=SWEEP_COLUMNS):
+    rows = []
+    for i, city in enumerate(WorkerData["Cities"].iloc[:, 0]):
+        row = dict(params)
+        row["City"] = city
+        for column in columns[1:]:
+            row[column] = float(Summary[column][i])
+        rows.append(row)
+    return rows
+
+#-- Summary at scale 1, with the annual H2 percentiles of resampled years when the sweep asks for them --
+def BaseSummary(HourlyPower):
+    Summary = HourlySummary(HourlyPower, WorkerData["Index"])
+    if WorkerData["Samples"]:
+        H2 = CumulativeResults(HourlyPower, WorkerData["Index"], "")["H2"]
+        Bands = BootstrapBands(H2, WorkerData["Index"].lengths, WorkerData["Block"], WorkerData["Samples"])
+        Summary.update({"AnnualH2" + p: Bands[p][-1] for p in ("P10", "P50", "P90")})
+    return Summary
+
+def SweepColumns():
+    return BAND_COLUMNS if WorkerData["Samples"] else SWEEP_COLUMNS
+
+# Each task gets every combination sharing one hub height (wind) or all of them (solar): the summary is calculated
+# once at scale 1 and scaled to each radius / panel size (see H2AppEngine.ScaleResults)
+def WindSweepTask(combos):
+    Base = BaseSummary(WindHourly(WorkerData["windspeed"], combos[0]["Height"], 1))
+    return len(combos), [row for params in combos for row in SummaryRows(ScaleResults(Base, WindScale(params["Radius"])), params, SweepColumns())]
+
+def SolarSweepTask(combos):
+    # Efficiency is given in % like the PV Efficiency slider
+    Latitudes = WorkerData["Cities"].iloc[:, 2].to_numpy(dtype=float)
+    HourlyPower = SolarHourly(WorkerData["windspeed"], WorkerData["temperature"], WorkerData["humidity"],
+                              Latitudes, WorkerData["Index"], 1, 1, WorkerData["ClearSky"])
+    Base = BaseSummary(HourlyPower)
+    return len(combos), [row for params in combos for row in SummaryRows(ScaleResults(Base, SolarScale(params["Area"], params["Efficiency"]/100)), params, SweepColumns())]
+
+# The capacity factor is only known when the sweep is given the rated capacity of the site
+def HybridColumns(params):
+    return HYBRID_COLUMNS + ["CapacityFactor"] if "Rated" in params else HYBRID_COLUMNS
+
+# Every combination in a task shares one hub height: wind and solar are worked out once at scale 1 from the same weather,
+# and each radius / panel size only adds them up again
+def HybridSweepTask(combos):
+    Latitudes = WorkerData["Cities"].iloc[:, 2].to_numpy(dtype=float)
+    Wind, Solar = HybridHourly(WorkerData["windspeed"], WorkerData["temperature"], WorkerData["humidity"], Latitudes,
+                               WorkerData["Index"], combos[0]["Height"], 1, 1, 1, WorkerData["ClearSky"])
+    rows = []
+    for params in combos:
+        Summary = HybridSummary(WindScale(params["Radius"])*Wind, SolarScale(params["Area"], params["Efficiency"]/100)*Solar,
+                                WorkerData["Index"], params.get("Rated"))
+        rows += SummaryRows(Summary, params, HybridColumns(params))
+    return len(combos), rows
+
+# Every combination in a task shares the windmill / panel, turndown and battery: all electrolyzer sizes are dispatched at once
+def ElectrolyzerSweepTask(combos):
+    params = combos[0]
+    if "Height" in params:
+        HourlyPower = WindHourly(WorkerData["windspeed"], params["Height"], params["Radius"])
+    else:
+        Latitudes = WorkerData["Cities"].iloc[:, 2].to_numpy(dtype=float)
+        HourlyPower = SolarHourly(WorkerData["windspeed"], WorkerData["temperature"], WorkerData["humidity"], Latitudes,
+                                  WorkerData["Index"], params["Area"], params["Efficiency"]/100, WorkerData["ClearSky"])
+    capacities = [combo["Capacity"] for combo in combos]
+    Totals = Dispatch(HourlyPower, WorkerData["Index"], capacities, params["MinLoad"], params["Battery"])
+    Summary = DispatchSummary(Totals, WorkerData["Index"], capacities) # AnnualMWh is the electricity the electrolyzer used
+    return len(combos), [row for s, combo in enumerate(combos)
+                         for row in SummaryRows({key: value[s] for key, value in Summary.items()}, combo, DISPATCH_COLUMNS)]
+
+#---- Evaluate every parameter combination for every city, ranked by annual H2 ----
+def RunSweep(mode, grid, database=WEATHER_DATABASE, cache_dir=WEATHER_CACHE_DIR, processes=None, progress=None, samples=0, block="week"):
+    # grid: {"Height": [...], "Radius": [...]} for wind or {"Area": [...], "Efficiency": [...]} for solar, and for the
+    # electrolyzer either of those plus {"Capacity": [...], "MinLoad": [...], "Battery": [...]}; hybrid takes the wind and
+    # solar ones, plus {"Rated": [...]} (MW) for the capacity factor
+    if cache_dir is not None:
+        WeatherData(database, cache_dir).Binary() # Build the binary cache once here, not in every worker
+    names = list(grid)
+    combos = [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    task = {"wind": WindSweepTask, "solar": SolarSweepTask, "electrolyzer": ElectrolyzerSweepTask, "hybrid": HybridSweepTask}[mode]
+    groups = {}
+    for combo in combos:
+        if mode == "electrolyzer":
+            key = tuple(value for name, value in combo.items() if name != "Capacity")
+        else:
+            key = combo["Height"] if mode in ("wind", "hybrid") else None
+        groups.setdefault(key, []).append(combo)
+    source = "hybrid" if mode == "hybrid" else ("wind" if "Height" in grid else "solar") # Power the workers load the weather for
+
+    rows = []
+    done = 0
+    with multiprocessing.Pool(min(processes or os.cpu_count(), len(groups)), initializer=InitWorker, initargs=(database, cache_dir, source, samples, block)) as pool:
+        for count, groupRows in pool.imap_unordered(task, groups.values()):
+            rows.extend(groupRows) # Rows are streamed in as each group of combinations finishes
+            done += count
+            if progress is not None:
+                progress(done, len(combos))
+
+    columns = {"electrolyzer": DISPATCH_COLUMNS, "hybrid": HybridColumns(grid)}.get(mode, BAND_COLUMNS if samples else SWEEP_COLUMNS)
+    table = pd.DataFrame(rows, columns=names + columns)
+    return table.sort_values(["AnnualH2", "H2Variability"], ascending=[False, True], ignore_index=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sweep windmill, solar panel or electrolyzer parameters for every city")
+    parser.add_argument("mode", choices=["wind", "solar", "electrolyzer", "hybrid"])
+    parser.add_argument("--heights", type=float, nargs="+", default=[80], help="Windmill heights (m)")
+    parser.add_argument("--radii", type=float, nargs="+", default=[60], help="Rotor radii (m)")
+    parser.add_argument("--areas", type=float, nargs="+", default=[1], help="Panel areas (m2)")
+    parser.add_argument("--efficiencies", type=float, nargs="+", default=[20], help="PV efficiencies (%%)")
+    parser.add_argument("--source", choices=["wind", "solar"], default="wind", help="Power feeding the electrolyzer")
+    parser.add_argument("--capacities", type=float, nargs="+", default=[2], help="Electrolyzer capacities (MW)")
+    parser.add_argument("--min-loads", type=float, nargs="+", default=[0.1], help="Electrolyzer minimum loads (fraction of capacity)")
+    parser.add_argument("--batteries", type=float, nargs="+", default=[0], help="Battery sizes (MWh), 0 for none")
+    parser.add_argument("--rated", type=float, nargs="+", default=None, help="Rated wind + solar capacity of the hybrid site (MW), adds its capacity factor")
+    parser.add_argument("--samples", type=int, default=0, help="Resampled years for the P10/P50/P90 annual H2 (wind/solar, default: none)")
+    parser.add_argument("--block", choices=["day", "week"], default="week", help="Length of the resampled blocks")
+    parser.add_argument("--database", default=WEATHER_DATABASE)
+    parser.add_argument("--cache-dir", default=WEATHER_CACHE_DIR)
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--output", default=None, help="Write the full ranked table to this CSV file")
+    parser.add_argument("--top", type=int, default=20, help="Number of rows to print")
+    args = parser.parse_args(argv)
+
+    source = args.source if args.mode == "electrolyzer" else args.mode
+    if source == "wind":
+        grid = {"Height": args.heights, "Radius": args.radii}
+    elif source == "solar":
+        grid = {"Area": args.areas, "Efficiency": args.efficiencies}
+    else:
+        grid = {"Height": args.heights, "Radius": args.radii, "Area": args.areas, "Efficiency": args.efficiencies}
+        if args.rated:
+            grid["Rated"] = args.rated
+    if args.mode == "electrolyzer":
+        grid.update({"Capacity": args.capacities, "MinLoad": args.min_loads, "Battery": args.batteries})
+
+    def progress(done, total):
+        print("\r" + str(done) + "/" + str(total) + " combinations", end="", file=sys.stderr)
+
+    table = RunSweep(args.mode, grid, args.database, args.cache_dir, args.processes, progress, args.samples, args.block)
+    print(file=sys.stderr)
+    if args.output:
+        table.to_csv(args.output, index=False)
+    print(table.head(args.top).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+import argparse
+import os
+import sqlite3
+
+import numpy as np
+
+# Synthetic stand-in for Datasets/weather.sqlite with the same tables and layout:
+#   latlong                         City, Country, Latitude, Longitude (one row per city)
+#   windspeed/temperature/humidity  Year, Month, Day, Hour + one column per city (same order as latlong)
+# Values follow rough seasonal/daily cycles (wind m/s, temperature K, relative humidity %), good enough for
+# benchmarking and running the app without the real dataset. Temperatures are in Kelvin like the real dataset, so
+# they go through the same conversion to Celsius when read (see H2AppData.WEATHER_UNITS).
+# Example:  python H2AppSynthetic.py /tmp/weather.sqlite --cities 120 --first-year 2001 --years 16
+
+
+#-- Hourly Year, Month, Day, Hour rows for one year --
+def YearHours(year):
+    hours = np.arange(np.datetime64(str(year) + "-01-01T00"), np.datetime64(str(year + 1) + "-01-01T00"), np.timedelta64(1, "h"))
+    months = hours.astype("datetime64[M]")
+    days = hours.astype("datetime64[D]")
+    return np.stack([np.full(hours.shape[0], year),
+                     months.astype(int) % 12 + 1,
+                     (days - months).astype(int) + 1,
+                     (hours - days).astype(int)], axis=1)
+
+#-- Synthetic hourly values [hours, cities] for one table and year --
+def SyntheticValues(table, datetimes, latitudes, rng):
+    n = datetimes.shape[0]
+    season = np.cos(2*np.pi*(np.arange(n)/24 - 196)/365)[:, None] # +1 in mid July, -1 in mid January
+    daily = np.cos(2*np.pi*(datetimes[:, 3] - 15)/24)[:, None] # +1 at 3pm
+    if table == "windspeed":
+        return np.round(rng.weibull(2.0, (n, latitudes.shape[0]))*(4 + 0.05*latitudes), 1)
+    if table == "temperature":
+        mean = 300 - 0.6*latitudes # Colder further north
+        return np.round(mean + (6 + 0.2*latitudes)*season + 4*daily + rng.normal(0, 2, (n, latitudes.shape[0])), 2)
+    return np.clip(np.round(70 - 15*daily + rng.normal(0, 10, (n, latitudes.shape[0]))), 5, 100)
+
+#---- Write a synthetic weather database with n_cities cities for years first_year .. first_year + n_years - 1 ----
+def MakeSyntheticWeather(path, n_cities=30, first_year=2013, n_years=4, seed=0):
+    if os.path.exists(path):
+        os.remove(path)
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = ["City" + str(i + 1).zfill(3) for i in range(n_cities)]
+    latitudes = np.round(rng.uniform(25, 50, n_cities), 4)
+    longitudes = np.round(rng.uniform(-125, -70, n_cities), 4)
+
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE latlong (City TEXT, Country TEXT, Latitude REAL, Longitude REAL)")
+    conn.executemany("INSERT INTO latlong VALUES (?, ?, ?, ?)",
+                     [(name, "Synthetic", float(lat), float(lon)) for name, lat, lon in zip(names, latitudes, longitudes)])
+    cityColumns = ", ".join('"' + name + '" REAL' for name in names)
+    for table in ("windspeed", "temperature", "humidity"):
+        conn.execute("CREATE TABLE " + table + " (Year INTEGER, Month INTEGER, Day INTEGER, Hour INTEGER, " + cityColumns + ")")
+    placeholders = ", ".join("?"*(4 + n_cities))
+    for year in range(first_year, first_year + n_years): # One year at a time so memory does not grow with n_years
+        datetimes = YearHours(year)
+        for table in ("windspeed", "temperature", "humidity"):
+            values = SyntheticValues(table, datetimes, latitudes, rng)
+            rows = [tuple(d) + tuple(v) for d, v in zip(datetimes.tolist(), values.tolist())]
+            conn.executemany("INSERT INTO " + table + " VALUES (" + placeholders + ")", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic weather.sqlite")
+    parser.add_argument("path", nargs="?", default="Datasets/weather.sqlite")
+    parser.add_argument("--cities", type=int, default=30)
+    parser.add_argument("--first-year", type=int, default=2013)
+    parser.add_argument("--years", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    MakeSyntheticWeather(args.path, args.cities, args.first_year, args.years, args.seed)
+
+
+if __name__ == "__main__":
+    main()
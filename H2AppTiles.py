@@ -0,0 +1,155 @@
+import argparse
+import http.server
+import os
+import re
+import sqlite3
+import struct
+import sys
+import urllib.request
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+# Persistent on-disk cache of map tiles. Uses the same SQLite layout as tkintermapview's offline database,
+# so the map widget reads it directly through TkinterMapView(database_path=...) and works without a network.
+# The cache is filled by seeding only: the map widget reads it but does not write the tiles it fetches live (when
+# zoomed past MAX_ZOOM or when a tile is missing) back to it, so those need a network every time the app runs.
+#   python H2AppTiles.py seed                       -> download zoom 0-5 from the tile server into the cache
+#   python H2AppTiles.py serve --port 8765          -> local stand-in tile server (cached tiles or a grey placeholder)
+#   python H2AppTiles.py seed --source http://localhost:8765/{z}/{x}/{y}.png   -> seed from the stand-in instead
+
+TILE_DATABASE = "Datasets/map_tiles.sqlite"
+TILE_SERVER = "https://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}&s=Ga"
+MAX_ZOOM = 5
+TILE_TYPES = ((b"\x89PNG\r\n\x1a\n", "image/png"), (b"\xff\xd8", "image/jpeg")) # Magic bytes -> content type
+
+
+#-- 256x256 grey PNG, returned by the stand-in server for tiles that are not cached --
+def PlaceholderTile(size=256, grey=0x40):
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    rows = b"".join(b"\x00" + bytes([grey])*size for _ in range(size)) # Filter byte + one greyscale byte per pixel
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+#-- Content type of a tile from its first bytes: the tile server's satellite tiles are JPEG, the placeholder and other servers' PNG --
+def TileType(image):
+    for magic, kind in TILE_TYPES:
+        if image.startswith(magic):
+            return kind
+    return "application/octet-stream"
+
+#-- Every (zoom, x, y) tile from zoom_min to zoom_max --
+def TileRange(zoom_min=0, zoom_max=MAX_ZOOM):
+    return [(zoom, x, y) for zoom in range(zoom_min, zoom_max + 1) for x in range(2**zoom) for y in range(2**zoom)]
+
+
+class TileCache:
+    def __init__(self, path=TILE_DATABASE):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS server (url VARCHAR(300) PRIMARY KEY NOT NULL, max_zoom INTEGER NOT NULL);")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS tiles (zoom INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL, "
+                          "server VARCHAR(300) NOT NULL, tile_image BLOB NOT NULL, "
+                          "CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url), "
+                          "CONSTRAINT pk_tiles PRIMARY KEY (zoom, x, y, server));")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS sections (position_a VARCHAR(100) NOT NULL, position_b VARCHAR(100) NOT NULL, "
+                          "zoom_a INTEGER NOT NULL, zoom_b INTEGER NOT NULL, server VARCHAR(300) NOT NULL, "
+                          "CONSTRAINT fk_server FOREIGN KEY (server) REFERENCES server (url), "
+                          "CONSTRAINT pk_tiles PRIMARY KEY (position_a, position_b, zoom_a, zoom_b, server));")
+        self.conn.commit()
+
+    def Get(self, tile_server, zoom, x, y):
+        row = self.conn.execute("SELECT tile_image FROM tiles WHERE zoom=? AND x=? AND y=? AND server=?;", (zoom, x, y, tile_server)).fetchone()
+        return None if row is None else row[0]
+
+    def Put(self, tile_server, zoom, x, y, image):
+        self.conn.execute("INSERT OR IGNORE INTO server (url, max_zoom) VALUES (?, ?);", (tile_server, MAX_ZOOM))
+        self.conn.execute("INSERT OR REPLACE INTO tiles (zoom, x, y, server, tile_image) VALUES (?, ?, ?, ?, ?);", (zoom, x, y, tile_server, image))
+
+    def Missing(self, tile_server, zoom_min=0, zoom_max=MAX_ZOOM):
+        cached = set(self.conn.execute("SELECT zoom, x, y FROM tiles WHERE server=? AND zoom BETWEEN ? AND ?;", (tile_server, zoom_min, zoom_max)))
+        return [tile for tile in TileRange(zoom_min, zoom_max) if tile not in cached]
+
+    def Close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+def FetchTile(source, zoom, x, y, timeout=10):
+    request = urllib.request.Request(source.format(z=zoom, x=x, y=y), headers={"User-Agent": "RenewableH2App"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.read()
+
+#---- Download all missing tiles for zoom_min..zoom_max into the cache ----
+def SeedTiles(path=TILE_DATABASE, tile_server=TILE_SERVER, zoom_min=0, zoom_max=MAX_ZOOM, source=None, workers=8, progress=None):
+    # Tiles are stored under tile_server (the URL the map widget asks for) but fetched from source, e.g. a local stand-in
+    source = tile_server if source is None else source
+    cache = TileCache(path)
+    missing = cache.Missing(tile_server, zoom_min, zoom_max)
+    failed = 0
+    with ThreadPoolExecutor(workers) as pool:
+        futures = {tile: pool.submit(FetchTile, source, *tile) for tile in missing}
+        for done, (tile, future) in enumerate(futures.items(), start=1):
+            try:
+                cache.Put(tile_server, *tile, future.result())
+            except OSError as ex:
+                failed += 1
+                print('Could not fetch tile ' + str(tile) + ': ' + str(ex), file=sys.stderr)
+            if done % 100 == 0:
+                cache.conn.commit()
+            if progress is not None:
+                progress(done, len(missing))
+    cache.Close()
+    return len(missing) - failed, failed
+
+#---- Local stand-in tile server on /{z}/{x}/{y}.png, serving cached tiles or a placeholder ----
+def ServeTiles(path=TILE_DATABASE, tile_server=TILE_SERVER, port=8765):
+    cache = TileCache(path)
+    placeholder = PlaceholderTile()
+
+    class TileHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = re.match(r"^/(\d+)/(\d+)/(\d+)(\.png)?$", self.path)
+            if match is None:
+                self.send_error(404)
+                return
+            image = cache.Get(tile_server, *(int(value) for value in match.groups()[:3])) or placeholder
+            self.send_response(200)
+            self.send_header("Content-Type", TileType(image))
+            self.send_header("Content-Length", str(len(image)))
+            self.end_headers()
+            self.wfile.write(image)
+
+        def log_message(self, format, *args): # Keep the console quiet, one line per tile is too much
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", port), TileHandler)
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline map tile cache for the map page")
+    parser.add_argument("command", choices=["seed", "serve"])
+    parser.add_argument("--database", default=TILE_DATABASE)
+    parser.add_argument("--tile-server", default=TILE_SERVER, help="Tile URL the map widget uses (cache key)")
+    parser.add_argument("--source", default=None, help="Fetch tiles from this URL instead, e.g. a local stand-in server")
+    parser.add_argument("--min-zoom", type=int, default=0)
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    if args.command == "seed":
+        def progress(done, total):
+            print("\r" + str(done) + "/" + str(total) + " tiles", end="", file=sys.stderr)
+        saved, failed = SeedTiles(args.database, args.tile_server, args.min_zoom, args.max_zoom, args.source, progress=progress)
+        print("\nSaved " + str(saved) + " tiles, " + str(failed) + " failed", file=sys.stderr)
+    else:
+        server = ServeTiles(args.database, args.tile_server, args.port)
+        print("Serving tiles on http://127.0.0.1:" + str(args.port) + "/{z}/{x}/{y}.png", file=sys.stderr)
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
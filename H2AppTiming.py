@@ -0,0 +1,99 @@
+import contextlib
+import cProfile
+import datetime
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+# Phase timings for the app. A Timer covers one piece of work (startup, showing a map, a city page) and records how long
+# each of its phases took. Every phase is written as one JSON line to the "H2App.timing" logger. Switched on with:
+#   H2APP_TIMING_LOG=timing.jsonl   -> append the JSON lines to this file
+#   H2APP_OVERLAY=1                 -> show the phase times of the current map/page in the left frame
+#   H2APP_PROFILE=profiles          -> cProfile every city page calculation and drawing into profiles/*.prof
+# Example:  H2APP_TIMING_LOG=timing.jsonl H2APP_OVERLAY=1 python main.py
+
+TIMING_LOG = os.environ.get("H2APP_TIMING_LOG")
+SHOW_OVERLAY = os.environ.get("H2APP_OVERLAY", "") not in ("", "0")
+PROFILE_DIR = os.environ.get("H2APP_PROFILE")
+
+logger = logging.getLogger("H2App.timing")
+logger.addHandler(logging.NullHandler())
+
+
+#-- Send the JSON lines to a file, nothing is formatted or written while this is not called --
+def ConfigureTimingLog(path=TIMING_LOG):
+    if path is None:
+        return
+    handler = logging.FileHandler(path)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+class Timer:
+    def __init__(self, scope, **fields):
+        self.scope = scope # e.g. "startup", "map", "page"
+        self.fields = fields # Logged with every phase, e.g. city and windmill parameters
+        self.phases = [] # (phase, seconds) in the order they finished
+        self.lock = threading.Lock() # Page phases finish on both the worker thread and the Tk thread
+        self.last = time.perf_counter()
+
+    #-- Time since the previous Lap (or since the Timer was made), for straight-line code --
+    def Lap(self, name):
+        now = time.perf_counter()
+        self.Record(name, now - self.last)
+        self.last = now
+
+    #-- Time of a block of code, for work on another thread or between laps --
+    @contextlib.contextmanager
+    def Phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.Record(name, time.perf_counter() - start)
+            self.last = time.perf_counter()
+
+    def Record(self, name, seconds):
+        with self.lock:
+            self.phases.append((name, seconds))
+        if logger.isEnabledFor(logging.INFO):
+            entry = {"time": datetime.datetime.now().isoformat(timespec="milliseconds"), "scope": self.scope, "phase": name,
+                     "ms": round(1000*seconds, 3), "thread": threading.current_thread().name}
+            logger.info(json.dumps(dict(entry, **self.fields), default=str))
+
+    def Total(self):
+        with self.lock:
+            return sum(seconds for name, seconds in self.phases)
+
+    #-- One line per phase plus the total, for the overlay --
+    def Summary(self):
+        with self.lock:
+            phases = list(self.phases)
+        lines = ["{:<9}{:>8.1f} ms".format(name[:9], 1000*seconds) for name, seconds in phases]
+        return "\n".join(lines + ["{:<9}{:>8.1f} ms".format("total", 1000*sum(seconds for name, seconds in phases))])
+
+
+#-- cProfile the block into PROFILE_DIR/<name>-<time>.prof when H2APP_PROFILE is set --
+@contextlib.contextmanager
+def Profiled(name):
+    if PROFILE_DIR is None:
+        yield
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError: # Only one profiler can run at a time, e.g. a cancelled page still finishing on its worker thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        profiler.dump_stats(os.path.join(PROFILE_DIR, re.sub(r"[^\w.-]+", "_", name) + "-" + stamp + ".prof"))
@@ -1,54 +1,27 @@
 import customtkinter as ctk
-import numpy as np
-import pandas as pd
-import matplotlib.pyplot as plt
-from matplotlib import ticker  # This is necessary to turn off scientific notation on graphs
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from tkintermapview import TkinterMapView
-import seaborn as sns
-import sqlite3
-
-from H2AppFunctions import P_wind, P_solar, H2Prod, KirmaniEff
-
-
-# <editor-fold desc="-- Prepare all data + containers (Pandas + Numpy) --">
-
-weather_database = "Datasets/weather.sqlite"
-conn = sqlite3.connect(weather_database)
-city_latlong = pd.read_sql_query("SELECT * FROM latlong", conn)
-city_windspeed = pd.read_sql_query("SELECT * FROM windspeed", conn)
-city_temperature = pd.read_sql_query("SELECT * FROM temperature", conn)
-city_humidity = pd.read_sql_query("SELECT * FROM humidity", conn)
-
-windspeed_byYear = city_windspeed.groupby(city_windspeed.Year)
-# Convert to numpy for more customizable matplotlib + function calls
-WindspeedData = np.zeros([8784, 34, 4]) #First index is hours/leap year, Middle index is 4 datetime columns + 30 cities, Last index is year 0 = 2013, etc
-WindspeedData[:8760,:, 0] = windspeed_byYear.get_group(2013).to_numpy()
-WindspeedData[:8760,:, 1] = windspeed_byYear.get_group(2014).to_numpy()
-WindspeedData[:8760,:, 2] = windspeed_byYear.get_group(2015).to_numpy()
-WindspeedData[:,:, 3] = windspeed_byYear.get_group(2016).to_numpy()
-Windpower = np.zeros([WindspeedData.shape[0], 4])
-WindH2 = np.zeros([WindspeedData.shape[0], 4])
-WindH2Avg = np.zeros(WindspeedData.shape[0])
-WindH2StdDev = np.zeros(WindspeedData.shape[0])
-Solarpower = np.zeros([WindspeedData.shape[0], 4])
-SolarH2 = np.zeros([WindspeedData.shape[0], 4])
-SolarH2Avg = np.zeros(WindspeedData.shape[0])
-SolarH2StdDev = np.zeros(WindspeedData.shape[0])
-SolarIrradianceSolstice = np.zeros(24) #This container is used to generate the daily solar trend graph
-SolarIrradianceWithWeather = np.zeros(24) #This includes Kirmani 2015 Weather correction correlation
-temperature_byYear = city_windspeed.groupby(city_temperature.Year)
-TemperatureData = np.zeros([WindspeedData.shape[0], 34, 4]) #Middle index is 4 datetime columns + 30 cities, Last index is year 0 = 2013, etc
-TemperatureData[:8760,:, 0] = temperature_byYear.get_group(2013).to_numpy()
-TemperatureData[:8760,:, 1] = temperature_byYear.get_group(2014).to_numpy()
-TemperatureData[:8760,:, 2] = temperature_byYear.get_group(2015).to_numpy()
-TemperatureData[:,:, 3] = temperature_byYear.get_group(2016).to_numpy()
-humidity_byYear = city_windspeed.groupby(city_humidity.Year)
-HumidityData = np.zeros([WindspeedData.shape[0], 34, 4])
-HumidityData[:8760,:, 0] = humidity_byYear.get_group(2013).to_numpy()
-HumidityData[:8760,:, 1] = humidity_byYear.get_group(2014).to_numpy()
-HumidityData[:8760,:, 2] = humidity_byYear.get_group(2015).to_numpy()
-HumidityData[:,:, 3] = humidity_byYear.get_group(2016).to_numpy()
+import os
+import threading
+
+from H2AppEngine import WindPageResults, SolarPageResults, WIND_WEATHER, SOLAR_WEATHER, WindHourly, SolarHourly, HourlySummary
+from H2AppEngine import HybridHourly, HybridSummary
+from H2AppEngine import ScaleResults, WindScale, SolarScale
+from H2AppCache import ResultCache
+from H2AppData import WeatherData
+from H2AppPlots import WindFigure, SolarFigure
+from H2AppTiles import TILE_DATABASE, TILE_SERVER, MAX_ZOOM
+from H2AppTiming import Timer, Profiled, ConfigureTimingLog, SHOW_OVERLAY
+
+
+# <editor-fold desc="-- Prepare data access + containers --">
+
+# Weather data is read lazily from Datasets/weather.sqlite, one city at a time (see H2AppData)
+Weather = WeatherData()
+
+# Computed city pages are kept in an LRU cache, keyed by city + windmill/panel parameters
+CACHE_MAX_MB = 64
+PageCache = ResultCache(max_bytes=CACHE_MAX_MB*1024*1024)
 # </editor-fold>
 
 
@@ -56,22 +29,76 @@ FONT = ("Helvetica", 14)
 APP_NAME = "Green Hydrogen Calculator"
 WIDTH = 1200
 HEIGHT = 750
+POLL_MS = 50 # How often the Tk loop checks on a city page calculation
+MAP_CENTER = (39.8097, -98.5556) # Lebanon, Kansas centers the map to USA
+MAP_ZOOM = 4
+MARKER_SCALE = {"Wind": ("#00144A", "#2CBDFE"), "Solar": ("#A93E00", "#FFD700"), "Hybrid": ("#0B3D20", "#7CFC00")} # Marker circle colours for lowest/highest annual H2
+
+
+#-- Blend between two hex colours, fraction 0 = low, 1 = high --
+def ScaleColor(fraction, low, high):
+    low = [int(low[i:i + 2], 16) for i in (1, 3, 5)]
+    high = [int(high[i:i + 2], 16) for i in (1, 3, 5)]
+    return "#" + "".join("{:02X}".format(int(round(l + (h - l)*fraction))) for l, h in zip(low, high))
+
+#-- MWh / tonnes on a marker: one decimal for a windmill, 3 significant digits for a few m2 of panel --
+def MarkerAmount(value):
+    return "{:,.1f}".format(value) if abs(value) >= 100 else "{:.3g}".format(value)
+
+
+class PageJob(threading.Thread):
+    # Runs one city page calculation off the Tk thread. Only App.PollPageJob (via after()) touches Tk with the result
+    def __init__(self, compute):
+        super().__init__(daemon=True)
+        self.compute = compute
+        self.cancel = threading.Event()
+        self.done = threading.Event()
+        self.progress = 0.0
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.compute(self)
+        except Exception as ex:
+            self.error = ex
+        self.done.set()
+
+    def Progress(self, fraction):
+        self.progress = fraction
+
+    def Cancelled(self):
+        return self.cancel.is_set()
 
 
 class App:
     def __init__(self, master):
+        timer = Timer("startup")
         ctk.set_appearance_mode("dark")
         self.master = master
 
         self.master.title(APP_NAME)
         self.master.geometry(str(WIDTH) + "x" + str(HEIGHT))
         self.master.minsize(WIDTH, HEIGHT)
+        self.page_job = None # City page (or map summary) calculation currently running on a worker thread
+        self.progress_bar = self.progress_label = None # Shown while page_job runs, see StartPageJob
+        self.page_canvases = {} # "Wind"/"Solar" -> (figure, canvas), see PageCanvas
+        self.map_frame = None # Created once by ShowMap and kept while switching between Wind/Solar and city pages
+        self.marker_list = []
+        self.timing_label = None # Phase timing overlay in the left frame, see ShowTimings
+        self.master.protocol("WM_DELETE_WINDOW", self.on_closing)
+        timer.Lap("window")
+        Weather.Cities(), Weather.Years(), Weather.Index() # Loaded once here, later look ups on the Tk thread don't take the data lock
+        timer.Lap("weather index")
 
         self.WindStartMap()
+        timer.Lap("first map")
 
     def WindStartMap(self):
-        for i in self.master.winfo_children():
-            i.destroy()
+        timer = Timer("map", mode="Wind")
+        self.CancelPageJob()
+        self.ClearWindow()
+        self.clear_marker_event() # The map itself is kept, only its markers are replaced
         self.marker_list = []
 
         try: #This checks if height has been defined at all
@@ -82,6 +109,7 @@ class App:
             self.radius = self.radius
         except Exception as ex:
             self.Set_WindmillRadius(60)  # Initialize parameter values
+        timer.Lap("clear")
 
         # ----- Create Two CTkFrames -----
 
@@ -92,15 +120,12 @@ class App:
         self.frame_left = ctk.CTkFrame(master=self.master, width=150, corner_radius=0, fg_color=None)
         self.frame_left.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
 
-        self.frame_right = ctk.CTkFrame(master=self.master, corner_radius=0)
-        self.frame_right.grid(row=0, column=1, rowspan=1, pady=0, padx=0, sticky="nsew")
-
         # ----- Left side of Frame -----
 
         self.frame_left.grid_rowconfigure(20, weight=1)
 
         self.button_1 = ctk.CTkSegmentedButton(master=self.frame_left,
-                                               values=["Wind", "Solar"],
+                                               values=["Wind", "Solar", "Hybrid"],
                                                command=self.ChangeRenewableMap,
                                                font = FONT)
         self.button_1.set("Wind")  # Set Wind as the initially selected value
@@ -119,24 +144,15 @@ class App:
         self.radiusinput = ctk.CTkEntry(master=self.frame_left, placeholder_text=self.radius,justify='center', font = FONT, fg_color="#1F6AA5")
         self.radiusinput.grid(row=4, column=0, padx=20, pady=10)
 
-        self.WindMapUpdate = ctk.CTkButton(master=self.frame_left,text="Update Parameters", command = self.UpdateWindmillParams)
+        self.WindMapUpdate = ctk.CTkButton(master=self.frame_left,text="Update Parameters", command = self.UpdateWindMap)
         self.WindMapUpdate.grid(row=5, column=0, padx=20, pady=10)
+        timer.Lap("widgets")
         # ----- Right side of Frame -----
+        self.ShowMap()
+        timer.Lap("map")
 
-        self.frame_right.grid_rowconfigure(1, weight=1)
-        self.frame_right.grid_rowconfigure(0, weight=0)
-        self.frame_right.grid_columnconfigure(0, weight=1)
-        self.frame_right.grid_columnconfigure(1, weight=0)
-        self.frame_right.grid_columnconfigure(2, weight=1)
-
-        self.map_widget = TkinterMapView(self.frame_right, corner_radius=0)
-        self.map_widget.grid(row=1, rowspan=1, column=0, columnspan=3, sticky="nswe", padx=(0, 0), pady=(0, 0))
-
-        # Initialize default values -> Using Lebanon, Kansas centers the map to USA
-        self.map_widget.set_address("Lebanon, Kansas")
-        self.map_widget.set_tile_server("https://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}&s=Ga", max_zoom=5)
-
-        self.InitializeWindMarkers()
+        self.InitializeWindMarkers(timer)
+        self.ShowTimings(timer, column=0)
 
         def on_closing(self, event=0):
             self.destroy()
@@ -150,21 +166,20 @@ class App:
     def UpdateWindmillParams(self):
         heightinputText = self.heightinput.get()
         radiusinputText = self.radiusinput.get()
-        print('Button pressed')
         try:
             self.height = float(heightinputText)
-            print(self.height)
-        except Exception as ex:
-            print('Trying to execute before value is set')
+        except ValueError: # Nothing (or no number) entered yet, keep the current value
+            pass
         try:
             self.radius = float(radiusinputText)
-            print(self.radius)
-        except Exception as ex:
-            print('Trying to execute before value is set')
+        except ValueError: # Nothing (or no number) entered yet, keep the current value
+            pass
 
     def SolarStartMap(self):
-        for i in self.master.winfo_children():
-            i.destroy()
+        timer = Timer("map", mode="Solar")
+        self.CancelPageJob()
+        self.ClearWindow()
+        self.clear_marker_event() # The map itself is kept, only its markers are replaced
         self.marker_list = []
 
         try: #This checks if parameters has been defined at all
@@ -175,6 +190,7 @@ class App:
             self.Efficiency = self.Efficiency
         except Exception as ex:
             self.Set_PVEfficiency(0.2)  # Initialize parameter values
+        timer.Lap("clear")
 
         # ----- Create Two CTkFrames -----
 
@@ -185,15 +201,12 @@ class App:
         self.frame_left = ctk.CTkFrame(master=self.master, width=150, corner_radius=0, fg_color=None)
         self.frame_left.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
 
-        self.frame_right = ctk.CTkFrame(master=self.master, corner_radius=0)
-        self.frame_right.grid(row=0, column=1, rowspan=1, pady=0, padx=0, sticky="nsew")
-
         # ----- Left banner of Frame ----
 
         self.frame_left.grid_rowconfigure(20, weight=1)
 
         self.button_1 = ctk.CTkSegmentedButton(master=self.frame_left,
-                                               values=["Wind", "Solar"],
+                                               values=["Wind", "Solar", "Hybrid"],
                                                command=self.ChangeRenewableMap)
         self.button_1.set("Solar")  # Set Wind as the initially selected value
         self.button_1.pack(padx=20, pady=10)
@@ -211,42 +224,117 @@ class App:
         self.efficiencyinput = ctk.CTkSlider(master=self.frame_left, from_ = 15, to = 25, number_of_steps=100,fg_color="#1F6AA5")
         self.efficiencyinput.grid(row=4, column=0, padx=20, pady=10)
 
-        self.SolarMapUpdate = ctk.CTkButton(master=self.frame_left,text="Update Parameters", command = self.UpdateSolarParams)
+        self.SolarMapUpdate = ctk.CTkButton(master=self.frame_left,text="Update Parameters", command = self.UpdateSolarMap)
         self.SolarMapUpdate.grid(row=5, column=0, padx=20, pady=10)
+        timer.Lap("widgets")
         # ----- Right side of Frame -----
+        self.ShowMap()
+        timer.Lap("map")
+        self.InitializeSolarMarkers(timer)
+        self.ShowTimings(timer, column=0)
 
-        self.frame_right.grid_rowconfigure(1, weight=1)
-        self.frame_right.grid_rowconfigure(0, weight=0)
-        self.frame_right.grid_columnconfigure(0, weight=1)
-        self.frame_right.grid_columnconfigure(1, weight=0)
-        self.frame_right.grid_columnconfigure(2, weight=1)
 
-        self.map_widget = TkinterMapView(self.frame_right, corner_radius=0)
-        self.map_widget.grid(row=1, rowspan=1, column=0, columnspan=3, sticky="nswe", padx=(0, 0), pady=(0, 0))
+        def on_closing(self, event=0):
+            self.destroy()
 
-        # Initialize default values
-        self.map_widget.set_address("Lebanon, Kansas")
-        self.map_widget.set_tile_server("https://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}&s=Ga", max_zoom=5)
-        self.InitializeSolarMarkers()
+    def HybridStartMap(self):
+        # A windmill and a solar panel on every site, the markers show their combined output (see H2AppEngine.HybridSummary)
+        timer = Timer("map", mode="Hybrid")
+        self.CancelPageJob()
+        self.ClearWindow()
+        self.clear_marker_event() # The map itself is kept, only its markers are replaced
+        self.marker_list = []
+
+        try: #This checks if parameters have been defined at all
+            self.height = self.height #This allows app to keep values once changed by user
+        except Exception as ex:
+            self.Set_WindmillHeight(80) # If not, initialize parameter values
+        try:
+            self.radius = self.radius
+        except Exception as ex:
+            self.Set_WindmillRadius(60)
+        try:
+            self.Area = self.Area
+        except Exception as ex:
+            self.Set_PanelArea(1)
+        try:
+            self.Efficiency = self.Efficiency
+        except Exception as ex:
+            self.Set_PVEfficiency(0.2)
+        timer.Lap("clear")
 
+        # ----- Create Two CTkFrames -----
 
-        def on_closing(self, event=0):
-            self.destroy()
+        self.master.grid_columnconfigure(0, weight=0)
+        self.master.grid_columnconfigure(1, weight=1)
+        self.master.grid_rowconfigure(0, weight=1)
+
+        self.frame_left = ctk.CTkFrame(master=self.master, width=150, corner_radius=0, fg_color=None)
+        self.frame_left.grid(row=0, column=0, padx=0, pady=0, sticky="nsew")
+
+        # ----- Left side of Frame -----
+
+        self.frame_left.grid_rowconfigure(20, weight=1)
+
+        self.button_1 = ctk.CTkSegmentedButton(master=self.frame_left,
+                                               values=["Wind", "Solar", "Hybrid"],
+                                               command=self.ChangeRenewableMap,
+                                               font = FONT)
+        self.button_1.set("Hybrid")
+        self.button_1.grid(pady=(20, 0), padx=(20, 20), row=0, column=0)
+
+        self.heightheader = ctk.CTkLabel(self.frame_left, text="Windmill Height (m)", font = FONT, text_color = '#FFFFFF')
+        self.heightheader.grid(row=1, column=0, padx=20, pady=(10,0))
+
+        self.heightinput = ctk.CTkEntry(master=self.frame_left, placeholder_text=self.height,justify='center', font = FONT, fg_color="#1F6AA5")
+        self.heightinput.grid(row=2, column=0, padx=20, pady=10)
+
+        self.radiusheader = ctk.CTkLabel(self.frame_left, text="Rotor Radius (m)", font = FONT, text_color = '#FFFFFF')
+        self.radiusheader.grid(row=3, column=0, padx=20, pady=(10,0))
+
+        self.radiusinput = ctk.CTkEntry(master=self.frame_left, placeholder_text=self.radius,justify='center', font = FONT, fg_color="#1F6AA5")
+        self.radiusinput.grid(row=4, column=0, padx=20, pady=10)
+
+        self.areaheader = ctk.CTkLabel(self.frame_left, text="Panel Area (m2)", font=FONT, text_color='#FFFFFF')
+        self.areaheader.grid(row=5, column=0, padx=20, pady=(10, 0))
+
+        self.areainput = ctk.CTkEntry(master=self.frame_left, placeholder_text=self.Area, justify='center', font=FONT,fg_color="#1F6AA5")
+        self.areainput.grid(row=6, column=0, padx=20, pady=10)
+
+        self.efficiencyheader = ctk.CTkLabel(self.frame_left, text="PV Efficiency (%)", font=FONT, text_color='#FFFFFF')
+        self.efficiencyheader.grid(row=7, column=0, padx=20, pady=(10, 0))
+
+        self.efficiencyinput = ctk.CTkSlider(master=self.frame_left, from_ = 15, to = 25, number_of_steps=100,fg_color="#1F6AA5")
+        self.efficiencyinput.grid(row=8, column=0, padx=20, pady=10)
+
+        self.HybridMapUpdate = ctk.CTkButton(master=self.frame_left,text="Update Parameters", command = self.UpdateHybridMap)
+        self.HybridMapUpdate.grid(row=9, column=0, padx=20, pady=10)
+        timer.Lap("widgets")
+        # ----- Right side of Frame -----
+        self.ShowMap()
+        timer.Lap("map")
+        self.InitializeHybridMarkers(timer)
+        self.ShowTimings(timer, column=0)
 
     def ChangeRenewableMap(self, Value):
         if Value == "Solar":
             self.SolarStartMap()
+        elif Value == "Hybrid":
+            self.HybridStartMap()
         else:
             self.WindStartMap()
 
-    def InitializeWindMarkers(self):
+    def InitializeWindMarkers(self, timer):
         self.clear_marker_event() #Reset the markers every time this is called
         self.UpdateWindmillParams()
+        city_latlong = Weather.Cities()
         for i in range(0, city_latlong.shape[0]):
             self.marker_list.append(
                 self.map_widget.set_marker(city_latlong.at[i, "Latitude"], city_latlong.at[i, "Longitude"],
                                            text=city_latlong.at[i, "City"], text_color="#FFFFFF", font=FONT, marker_color_outside = "#8396A8", marker_color_circle = "#00144A"))
             self.Set_WindMarker_Command(i)  # For some reason, turning this into a separate function helps avoid Lambda/functional programming from making all cities = Last city (Boston)
+        timer.Lap("markers")
+        self.UpdateMarkerSummaries("Wind", timer)
 
     def Set_WindMarker_Command(self, int):
         self.marker_list[int].command = lambda x: self.WindPowerPage(int)
@@ -261,66 +349,246 @@ class App:
     def UpdateSolarParams(self):
         areainputText = self.areainput.get()
         efficiencyinputText = self.efficiencyinput.get()
-        print('Button pressed')
         try:
             self.Area = float(areainputText)
-            print(self.Area)
-        except Exception as ex:
-            print('Trying to execute before value is set')
+        except ValueError: # Nothing (or no number) entered yet, keep the current value
+            pass
         try:
             self.Efficiency = float(efficiencyinputText)
-            print(self.Efficiency)
-        except Exception as ex:
-            print('Trying to execute before value is set')
+        except ValueError: # Nothing (or no number) entered yet, keep the current value
+            pass
 
-    def InitializeSolarMarkers(self):
+    def InitializeSolarMarkers(self, timer):
+        city_latlong = Weather.Cities()
         for i in range(0, city_latlong.shape[0]):
             self.UpdateSolarParams()
             self.marker_list.append(
                 self.map_widget.set_marker(city_latlong.at[i, "Latitude"], city_latlong.at[i, "Longitude"],
                                            text=city_latlong.at[i, "City"], text_color="#FFFFFF", font=FONT, marker_color_outside = "#FFB300", marker_color_circle = "#A93E00"))
             self.Set_SolarMarker_Command(i)  # For some reason, turning this into a separate function helps avoid Lambda/functional programming from making all cities = Last city (Boston)
+        timer.Lap("markers")
+        self.UpdateMarkerSummaries("Solar", timer)
 
     def Set_SolarMarker_Command(self, int):
         self.marker_list[int].command = lambda x: self.SolarPowerPage(int)
         #self.marker_list[int].command = lambda x: self.SolarPowerPage(city_latlong.at[int, "City"])
 
+    def InitializeHybridMarkers(self, timer):
+        self.UpdateWindmillParams()
+        self.UpdateSolarParams()
+        city_latlong = Weather.Cities()
+        for i in range(0, city_latlong.shape[0]):
+            self.marker_list.append(
+                self.map_widget.set_marker(city_latlong.at[i, "Latitude"], city_latlong.at[i, "Longitude"],
+                                           text=city_latlong.at[i, "City"], text_color="#FFFFFF", font=FONT, marker_color_outside = "#4CAF50", marker_color_circle = "#0B3D20"))
+        timer.Lap("markers")
+        self.UpdateMarkerSummaries("Hybrid", timer)
+
+    def UpdateWindMap(self):
+        timer = Timer("map update", mode="Wind")
+        self.UpdateWindmillParams()
+        self.UpdateMarkerSummaries("Wind", timer)
+
+    def UpdateSolarMap(self):
+        timer = Timer("map update", mode="Solar")
+        self.UpdateSolarParams()
+        self.UpdateMarkerSummaries("Solar", timer)
+
+    def UpdateHybridMap(self):
+        timer = Timer("map update", mode="Hybrid")
+        self.UpdateWindmillParams()
+        self.UpdateSolarParams()
+        self.UpdateMarkerSummaries("Hybrid", timer)
+
+    # <editor-fold desc="-- Per city summaries shown on the map markers --">
+    def UpdateMarkerSummaries(self, kind, timer):
+        # Annual MWh, tonnes H2 and year to year variability for every city in one vectorized pass, on the page worker
+        # (see StartPageJob) so the map stays responsive; the markers are labelled once it is done.
+        # Summaries are cached at scale 1 (see H2AppEngine.ScaleResults), so only a new windmill height recalculates.
+        # The hybrid peak ratio and correlation don't scale with the windmill / panel, so every parameter is in its key
+        cities = list(range(Weather.Cities().shape[0]))
+        PageCache.SetDataVersion(Weather.Version())
+        if kind == "Hybrid":
+            params = (self.height, self.radius, self.Area, self.Efficiency/100)
+            key, factor = ("HybridMap",) + params, 1
+            compute = lambda job: self.ComputeHybridSummary(job, cities, params, timer)
+        elif kind == "Wind":
+            height = self.height
+            key, factor = ("WindMap", height), WindScale(self.radius)
+            compute = lambda job: self.ComputeWindSummary(job, cities, height, timer)
+        else:
+            key, factor = ("SolarMap",), SolarScale(self.Area, self.Efficiency/100)
+            compute = lambda job: self.ComputeSolarSummary(job, cities, timer)
+        self.StartPageJob(key, compute, lambda Base: self.LabelMarkers(kind, ScaleResults(Base, factor), timer))
+
+    def ComputeWindSummary(self, job, cities, height, timer):
+        with timer.Phase("summaries"):
+            Windspeed = Weather.Series("windspeed", cities)
+            job.Progress(0.5)
+            if job.Cancelled():
+                return None
+            return HourlySummary(WindHourly(Windspeed, height, 1), Weather.Index())
+
+    def ComputeSolarSummary(self, job, cities, timer):
+        with timer.Phase("summaries"):
+            Latitudes = Weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+            Windspeed, Temperature, Humidity = (Weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity"))
+            job.Progress(0.5)
+            if job.Cancelled():
+                return None
+            HourlyPower = SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Weather.Index(), 1, 1, Weather.ClearSky(cities))
+            return HourlySummary(HourlyPower, Weather.Index())
+
+    def ComputeHybridSummary(self, job, cities, params, timer):
+        height, radius, PanelArea, Efficiency = params
+        with timer.Phase("summaries"):
+            Latitudes = Weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+            Windspeed, Temperature, Humidity = (Weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity"))
+            job.Progress(0.5)
+            if job.Cancelled():
+                return None
+            Wind, Solar = HybridHourly(Windspeed, Temperature, Humidity, Latitudes, Weather.Index(), height, radius,
+                                       PanelArea, Efficiency, Weather.ClearSky(cities))
+            return HybridSummary(Wind, Solar, Weather.Index())
+
+    def LabelMarkers(self, kind, Summary, timer):
+        low, high = MARKER_SCALE[kind]
+        H2 = Summary["AnnualH2"]
+        scale = (H2 - H2.min()) / max(H2.max() - H2.min(), 1e-12) # Marker colour goes from low to high annual H2
+        names = Weather.Cities().iloc[:, 0]
+        for i, marker in enumerate(self.marker_list):
+            if kind == "Hybrid": # How well the windmill and the panel fill in for each other
+                detail = "r {:+.2f}".format(Summary["Correlation"][i])
+            else:
+                detail = "\u00B1{:.0f}%".format(100*Summary["H2Variability"][i])
+            marker.set_text(names.iat[i] + "\n" + "{} MWh | {} t H2 | {}".format(
+                MarkerAmount(Summary["AnnualMWh"][i]), MarkerAmount(H2[i]), detail))
+            marker.marker_color_circle = ScaleColor(scale[i], low, high)
+            marker.draw()
+        timer.Lap("labels")
+        self.ShowTimings(timer, column=0)
+    # </editor-fold>
+
     def clear_marker_event(self):
         for marker in self.marker_list:
             marker.delete()
 
     def on_closing(self, event=0):
-        self.destroy()
+        self.CancelPageJob()
+        for figure, canvas in self.page_canvases.values():
+            figure.Close()
+        self.page_canvases = {}
+        Weather.Close()
+        self.master.destroy()
+
+    # <editor-fold desc="-- Window contents + reusable page figures --">
+    def ClearWindow(self):
+        # Destroys everything except the map and the page canvases, which are only hidden so they can be reused
+        keep = [canvas.get_tk_widget() for figure, canvas in self.page_canvases.values()]
+        for i in self.master.winfo_children():
+            if i is self.map_frame:
+                i.grid_remove()
+            elif i in keep:
+                i.place_forget()
+            else:
+                i.destroy()
+
+    def ShowMap(self):
+        # The map widget is built once, centred on fixed coordinates (no geocoding) and reading tiles from the
+        # offline tile cache when it has been seeded (see H2AppTiles), so switching modes needs no network
+        if self.map_frame is None:
+            self.map_frame = ctk.CTkFrame(master=self.master, corner_radius=0)
+            self.map_frame.grid_rowconfigure(1, weight=1)
+            self.map_frame.grid_rowconfigure(0, weight=0)
+            self.map_frame.grid_columnconfigure(0, weight=1)
+            self.map_frame.grid_columnconfigure(1, weight=0)
+            self.map_frame.grid_columnconfigure(2, weight=1)
+
+            tile_database = TILE_DATABASE if os.path.isfile(TILE_DATABASE) else None
+            self.map_widget = TkinterMapView(self.map_frame, corner_radius=0, database_path=tile_database)
+            self.map_widget.grid(row=1, rowspan=1, column=0, columnspan=3, sticky="nswe", padx=(0, 0), pady=(0, 0))
+            self.map_widget.set_tile_server(TILE_SERVER, max_zoom=MAX_ZOOM)
+            self.map_widget.set_position(*MAP_CENTER)
+            self.map_widget.set_zoom(MAP_ZOOM)
+        self.map_frame.grid(row=0, column=1, rowspan=1, pady=0, padx=0, sticky="nsew")
+        self.frame_right = self.map_frame
+
+    def ShowTimings(self, timer, column):
+        # Phase times of the current map/page under the left frame's widgets, only with H2APP_OVERLAY=1 (see H2AppTiming)
+        if not SHOW_OVERLAY:
+            return
+        if self.timing_label is None or self.timing_label.master is not self.frame_left: # The left frame is rebuilt for every page
+            self.timing_label = ctk.CTkLabel(self.frame_left, text="", font=("Courier", 11), justify="left", text_color="#9E9E9E")
+            self.timing_label.grid(row=30, column=column, padx=10, pady=(0, 10))
+        self.timing_label.configure(text=timer.Summary())
+
+    def PageCanvas(self, kind, FigureClass):
+        # One figure + canvas per page type, created on first use and updated in place afterwards
+        if kind not in self.page_canvases:
+            figure = FigureClass()
+            canvas = FigureCanvasTkAgg(figure.fig, master=self.master) #These are necessary to actually render Matplotlib graphs
+            self.page_canvases[kind] = (figure, canvas)
+        return self.page_canvases[kind]
+    # </editor-fold>
+
+    # <editor-fold desc="-- City page (and map summary) calculations on a worker thread --">
+    def StartPageJob(self, key, compute, render):
+        self.CancelPageJob() # Only one calculation at a time, the newest one
+        Results = PageCache.Get(key)
+        if Results is not None: # Pages already calculated with these parameters are drawn straight away
+            render(Results)
+            return
+
+        self.progress_label = ctk.CTkLabel(self.frame_right, text="Calculating...", font=FONT)
+        self.progress_label.place(relx=0.5, rely=0.45, anchor="center")
+        self.progress_bar = ctk.CTkProgressBar(self.frame_right, width=300)
+        self.progress_bar.set(0)
+        self.progress_bar.place(relx=0.5, rely=0.5, anchor="center")
+
+        job = PageJob(compute)
+        self.page_job = job
+        job.start()
+        self.master.after(POLL_MS, lambda: self.PollPageJob(job, key, render))
+
+    def PollPageJob(self, job, key, render):
+        if job is not self.page_job: # Cancelled or replaced by a newer page, so its results are never drawn
+            return
+        if not job.done.is_set():
+            self.progress_bar.set(job.progress)
+            self.master.after(POLL_MS, lambda: self.PollPageJob(job, key, render))
+            return
+
+        self.page_job = None
+        self.HideProgress()
+        if job.error is not None:
+            self.progress_label = ctk.CTkLabel(self.frame_right, text="Calculation failed: " + str(job.error), font=FONT)
+            self.progress_label.place(relx=0.5, rely=0.5, anchor="center")
+            return
+        render(PageCache.Put(key, job.result))
+
+    def CancelPageJob(self):
+        if self.page_job is not None:
+            self.page_job.cancel.set()
+            self.page_job = None
+        self.HideProgress()
+
+    def HideProgress(self):
+        # The map frame is kept between pages, so its progress bar (or error) has to go before anything else is shown
+        for widget in (self.progress_bar, self.progress_label):
+            if widget is not None and widget.winfo_exists():
+                widget.destroy()
+        self.progress_bar = self.progress_label = None
+    # </editor-fold>
 
     def WindPowerPage(self, cityNum):
-        for i in self.master.winfo_children():
-            i.destroy()
+        self.CancelPageJob() # A newer page always replaces a calculation that is still running
+        self.ClearWindow()
 
         height = self.height
         radius = self.radius
 
-        cityName = city_latlong.iat[cityNum, 0]
-
-        for i in range(1, WindspeedData.shape[0]):  # Perform calculations for Windpower and H2 evolution
-            if i < 8760:  # 2016 is a leap year so need to check if loop has extended past end of other arrays
-                Windpower[i,0] = Windpower[i - 1,0] + P_wind(radius, height, WindspeedData[i, (cityNum + 4),0]) / 1000000  # Convert to MWh
-                Windpower[i,1] = Windpower[i - 1,1] + P_wind(radius, height,WindspeedData[i, (cityNum + 4),1]) / 1000000
-                Windpower[i,2] = Windpower[i - 1,2] + P_wind(radius, height,WindspeedData[i, (cityNum + 4),2]) / 1000000
-                WindH2[i,0] = WindH2[i - 1,0] + H2Prod((Windpower[i,0] - Windpower[i-1,0]))  # ton/hr H2 production by Electrolysis
-                WindH2[i,1] = WindH2[i - 1,1] + H2Prod((Windpower[i,1] - Windpower[i - 1,1]))
-                WindH2[i,2] = WindH2[i - 1,2] + H2Prod((Windpower[i,2] - Windpower[i - 1,2]))
-            else: #Need to pass non leapyear values forward to avoid graph dropping to zero
-                Windpower[i, 0] = Windpower[i-1,0]
-                Windpower[i, 1] = Windpower[i - 1, 1]
-                Windpower[i, 2] = Windpower[i - 1, 2]
-            Windpower[i,3] = Windpower[i - 1,3] + P_wind(radius, height, WindspeedData[i, (cityNum + 4),3]) / 1000000
-            WindH2[i,3] = WindH2[i - 1,3] + H2Prod((Windpower[i,3] - Windpower[i - 1,3]))
-            if i < 8760:
-                WindH2Avg[i] = (WindH2[i,0] + WindH2[i,1] + WindH2[i,2] + WindH2[i,3]) / 4
-                WindH2StdDev[i] = np.sqrt(((WindH2[i,0]-WindH2Avg[i])**2 + (WindH2[i,1]-WindH2Avg[i])**2 + (WindH2[i,2]-WindH2Avg[i])**2 + (WindH2[i,3]-WindH2Avg[i])**2) /4)
-            else:
-                WindH2Avg[i] = WindH2Avg[i - 1]  # Continue the last leap day
-                WindH2StdDev[i] = WindH2StdDev[i-1]
+        cityName = Weather.Cities().iat[cityNum, 0]
+        timer = Timer("page", page="Wind", city=cityName, height=height, radius=radius)
 
         # ------ Create Two CTkFrames -------
         self.master.grid_columnconfigure(0, weight=0)
@@ -352,117 +620,37 @@ class App:
         #Moving this button to Row 25 while making rowconfigure=20 seems necessary to move this button to very bottom
         self.button_1.grid(row=25, column=1, padx=20, pady=10)
 
-        # ------ Right side of Frame ------
-
-        fig, ax = plt.subplots(nrows=2, ncols=2, figsize=(11, 7.75), dpi=144, facecolor='#000000')
-        fig.suptitle(cityName + " - Wind Power Data", fontsize=18, color='white')
-        fig.tight_layout()  # This prevents subplot titles from overlapping with xlabel
-        plt.subplots_adjust(top=0.9, wspace = 0.2, hspace=0.25, left = 0.075, bottom = 0.1, right = 0.95) #This helps separate subplots from supertitle
-        plt.subplot(221)
-        plt.title('Raw Time Series - Wind Velocity', color='white')
-        ax[0, 0].plot(WindspeedData[:, (cityNum + 4),0], 'o', color='#2CBDFE', label='2013')
-        ax[0, 0].plot(WindspeedData[:, (cityNum + 4),1], 'H', color='#5986E4', label='2014')
-        ax[0, 0].plot(WindspeedData[:, (cityNum + 4),2], 'h', color='#8D46C7', label='2015')
-        ax[0, 0].plot(WindspeedData[:, (cityNum + 4),3], '.', color='#B317B1', label='2016')
-        ax[0, 0].set_xlabel("Hours in Year", color='white')
-        ax[0, 0].set_ylabel("Wind Velocity (m/s)", color='white')
-        ax[0, 0].grid(color='white', alpha=0.4, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        ax[0, 0].set_facecolor('#121212')
-        plt.gca().legend(loc='upper right')
-        plt.subplot(222)  # Violin plot showing Wind speed distribution per year
-        plt.title('Wind Speed Distributions', color='white')
-        xpos = [2013, 2014, 2015, 2016]  # X-axis positions
-        ViolinDataCol = [WindspeedData[:, (cityNum + 4),0], WindspeedData[:, (cityNum + 4),1],
-                         WindspeedData[:, (cityNum + 4),2], WindspeedData[:, (cityNum + 4),3]]
-        violin_parts = ax[0, 1].violinplot(ViolinDataCol, xpos, widths=0.75, showmeans=True)
-        temp = 0
-        for vp in violin_parts['bodies']:  # This is necessary to change the violin colours to darkmode colour scheme
-            vp.set_edgecolor('#FFFFFF')
-            vp.set_alpha(0.5)
-            if temp == 0:
-                vp.set_facecolor('#2CBDFE')
-            elif temp == 1:
-                vp.set_facecolor('#5986E4')
-            elif temp == 2:
-                vp.set_facecolor('#8D46C7')
-            elif temp == 3:
-                vp.set_facecolor('#B317B1')
-            temp = temp + 1;  # Create a dummy variable to iterate through violin parts
-        ax[0, 1].set_ylabel("Wind Velocity (m/s)", color='white')
-        ax[0, 1].set_ylim(0, 15)
-        plt.xticks([2013, 2014, 2015, 2016], color='white')
-        plt.yticks(color='white')
-        ax[0, 1].grid(color='white', alpha=0.15, linestyle='--')
-        ax[0, 1].set_facecolor('#121212')
-        plt.subplot(223)  # Cumulative Wind power produced per year
-        plt.title('Cumulative Wind Power Produced', color='white')
-        ax[1, 0].plot(Windpower[:,0], color='#2CBDFE', label='2013')
-        ax[1, 0].plot(Windpower[:,1], color='#5986E4', label='2014')
-        ax[1, 0].plot(Windpower[:,2], color='#8D46C7', label='2015')
-        ax[1, 0].plot(Windpower[:,3], color='#B317B1', label='2016')
-        ax[1, 0].set_xlabel("Hours in Year", color='white')
-        ax[1, 0].set_ylabel("Cumulative Wind Power Generated (MWh)", color='white')
-        #plt.gca().yaxis.set_major_formatter(ticker.ScalarFormatter())
-        #plt.gca().yaxis.set_major_formatter(ticker.StrMethodFormatter("{x}"))
-        #ax[1, 0].set_yticklabels(plt.yticks()[0].astype(int))  # Removes decimal from number
-        ax[1, 0].grid(color='white', alpha=0.15, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        plt.gca().legend(loc='upper left')
-        ax[1, 0].set_facecolor('#121212')
-        plt.subplot(224)  # Cumulative Wind power produced per year
-        plt.title('Cumulative Hydrogen Electrolyzed', color='white')
-        ax[1, 1].plot(WindH2Avg, color='#018786')
-        plt.fill_between(np.arange(0, WindH2Avg.shape[0]), WindH2Avg - 2*WindH2StdDev, WindH2Avg + 2*WindH2StdDev, color="#03DAC6", alpha = 0.15) #This creates std dev
-        ax[1, 1].set_xlabel("Hours in Year", color='white')
-        ax[1, 1].set_ylabel("Cumulative Hydrogen Generated (tonnes)", color='white')
-        #plt.gca().yaxis.set_major_formatter(ticker.ScalarFormatter())
-        #plt.gca().yaxis.set_major_formatter(ticker.StrMethodFormatter("{x}"))
-        #ax[1, 1].set_yticklabels(plt.yticks()[0].astype(int))  # Removes decimal from number
-        ax[1, 1].grid(color='white', alpha=0.15, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        ax[1, 1].set_facecolor('#121212')
-
-        canvas = FigureCanvasTkAgg(fig, master=root) #These are necessary to actually render Matplotlib graphs
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.15, rely=0.0)
+        # Perform calculations for Windpower and H2 evolution on a worker thread (see H2AppEngine for the leap year handling)
+        # The page is calculated for a 1m rotor and scaled to the radius, so a new radius for the same height is drawn straight away
+        timer.Lap("banner")
+        PageCache.SetDataVersion(Weather.Version())
+        self.StartPageJob(("Wind", cityNum, height),
+                          lambda job: self.ComputeWindPage(job, cityNum, height, timer),
+                          lambda Results: self.RenderWindPage(cityName, Results, radius, timer))
+
+    def ComputeWindPage(self, job, cityNum, height, timer):
+        with Profiled("wind-" + str(cityNum) + "-compute"):
+            return WindPageResults(Weather, [cityNum], height, timer, job) # See H2AppEngine for the page results
+
+    def RenderWindPage(self, cityName, Results, radius, timer):
+        with Profiled("wind-" + cityName + "-render"):
+            with timer.Phase("scale"):
+                Results = ScaleResults(Results, WindScale(radius), fixed=WIND_WEATHER)
+            figure, canvas = self.PageCanvas("Wind", WindFigure)
+            figure.Update(cityName, Weather.Years(), Results, timer) # Times its own lines / distribution / band phases
+            with timer.Phase("draw"):
+                canvas.draw()
+            canvas.get_tk_widget().place(relx=0.15, rely=0.0)
+        self.ShowTimings(timer, column=1)
 
     def SolarPowerPage(self, cityNum):
-        for i in self.master.winfo_children():
-            i.destroy()
-        cityName = city_latlong.iat[cityNum, 0]
+        self.CancelPageJob()
+        self.ClearWindow()
+        cityName = Weather.Cities().iat[cityNum, 0]
 
         Efficiency = self.Efficiency/100
         PanelArea = self.Area
-
-        for i in range(1, WindspeedData.shape[0]):  # Perform calculations for Windpower and H2 evolution
-            if i < 8760:  # 2016 is a leap year so need to check if loop has extended past end of other arrays
-                #Using the Day/Hour from Windpower dataset, divide by 1000 to get kWh
-                #Convert wind speed in Kirmani 2015 weather correlation from m/s to km/hr
-                Solarpower[i,0] = Solarpower[i-1,0] + (Efficiency*PanelArea*P_solar(city_latlong.iat[cityNum, 2], int(i/24)+1, WindspeedData[i,3,0])/1000)*KirmaniEff(WindspeedData[i, (cityNum + 4),0]*3.6,TemperatureData[i,(cityNum + 4),0],HumidityData[i,(cityNum + 4),0])
-                Solarpower[i,1] = Solarpower[i-1,1] + (Efficiency*PanelArea*P_solar(city_latlong.iat[cityNum, 2],int(i/24)+1, WindspeedData[i,3,1])/1000)*KirmaniEff(WindspeedData[i, (cityNum + 4),1]*3.6,TemperatureData[i,(cityNum + 4),1],HumidityData[i,(cityNum + 4),1])
-                Solarpower[i,2] = Solarpower[i-1,2] + (Efficiency*PanelArea*P_solar(city_latlong.iat[cityNum, 2],int(i/24)+1, WindspeedData[i,3,2])/1000)*KirmaniEff(WindspeedData[i, (cityNum + 4),2]*3.6,TemperatureData[i,(cityNum + 4),2],HumidityData[i,(cityNum + 4),2])
-                SolarH2[i,0] = SolarH2[i - 1,0] + H2Prod((Solarpower[i,0] - Solarpower[i - 1,0]))
-                SolarH2[i,1] = SolarH2[i - 1,1] + H2Prod((Solarpower[i,1] - Solarpower[i - 1,1]))
-                SolarH2[i,2] = SolarH2[i - 1,2] + H2Prod((Solarpower[i,2] - Solarpower[i - 1,2]))
-                if (i >= 4105) and (i <= 4128): #This generates the daily solar irradiance trend for summer solstice = Day 172 June 21st
-                    SolarIrradianceSolstice[i-4105] = P_solar(city_latlong.iat[cityNum, 2],172, WindspeedData[i,3,2])
-                    SolarIrradianceWithWeather[i - 4105] = P_solar(city_latlong.iat[cityNum, 2], 172,WindspeedData[i, 3,2])*KirmaniEff(WindspeedData[i, (cityNum + 4),2]*3.6,TemperatureData[i,(cityNum + 4),3],HumidityData[i,(cityNum + 4),3])
-            else: #Need to pass non-leap year values forward to avoid graphs dropping to zero
-                Solarpower[i, 0] = Solarpower[i-1, 0]
-                Solarpower[i, 1] = Solarpower[i - 1, 1]
-                Solarpower[i, 2] = Solarpower[i - 1, 2]
-            Solarpower[i,3] = Solarpower[i-1,3] + (Efficiency*PanelArea*P_solar(city_latlong.iat[cityNum, 2],int(i/24)+1, WindspeedData[i,3,3])/1000)*KirmaniEff(WindspeedData[i, (cityNum + 4),3]*3.6,TemperatureData[i,(cityNum + 4),3],HumidityData[i,(cityNum + 4),3])
-            SolarH2[i,3] = SolarH2[i - 1,3] + H2Prod((Solarpower[i,3] - Solarpower[i - 1,3]))
-            if i < 8760:
-                SolarH2Avg[i] = (SolarH2[i,0] + SolarH2[i,1] + SolarH2[i,2] + SolarH2[i,3]) / 4
-                SolarH2StdDev[i] = np.sqrt(((SolarH2[i,0]-SolarH2Avg[i])**2 + (SolarH2[i,1]-SolarH2Avg[i])**2 + (SolarH2[i,2]-SolarH2Avg[i])**2 + (SolarH2[i,3]-SolarH2Avg[i])**2) /4)
-            else:
-                SolarH2Avg[i] = SolarH2Avg[i - 1]  # Continue the last leap day
-                SolarH2StdDev[i] = SolarH2StdDev[i-1]
+        timer = Timer("page", page="Solar", city=cityName, area=PanelArea, efficiency=Efficiency)
 
         # ----- Create Two CTKFrames -----
         self.master.grid_columnconfigure(0, weight=0)
@@ -492,72 +680,32 @@ class App:
                                       command=self.SolarStartMap)
         self.button_1.grid(row=25, column=1, padx=20, pady=10)
 
-        # ------ Right panel of Frame -----
-        fig, ax = plt.subplots(nrows=2, ncols=2, figsize=(11, 7.75), dpi=144, facecolor='#000000')
-        fig.suptitle(cityName + " - Solar Power Data", fontsize=18, color='white')
-        fig.tight_layout()  # This prevents subplot titles from overlapping with xlabel
-        plt.subplots_adjust(top=0.9, wspace = 0.2, hspace=0.25, left = 0.075, bottom = 0.1, right = 0.95) #This helps separate subplots from supertitle
-        plt.subplot(221)
-        ax[0,0].plot(SolarIrradianceSolstice, color='#FF5700', label='No Weather Correction')
-        ax[0, 0].plot(SolarIrradianceWithWeather, color='#FFD700', label='Kirmani 2015 Weather Correction')
-        ax[0, 0].grid(color='white', alpha=0.4, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        ax[0, 0].set_facecolor('#121212')
-        plt.gca().legend(loc='lower left')
-        ax[0, 0].set_ylabel("Irradiance (W/m2)", color='white')
-        ax[0, 0].set_xlabel("Hours", color='white')
-        plt.title('Summer Solstice Solar Irradiance', color='white')
-        plt.subplot(222)
-        plt.title('Relative Humidity Distribution', color='white')
-        sns.kdeplot(HumidityData[:,(cityNum+4), 0], color='#2CBDFE', fill=True,alpha = 0.3, linewidth = 0, label='2013')
-        sns.kdeplot(HumidityData[:, (cityNum + 4), 1], color='#5986E4', fill=True, alpha=0.3, linewidth=0, label='2014')
-        sns.kdeplot(HumidityData[:, (cityNum + 4), 2], color='#8D46C7', fill=True, alpha=0.3, linewidth=0, label='2015')
-        sns.kdeplot(HumidityData[:, (cityNum + 4), 3], color='#B317B1', fill=True, alpha=0.3, linewidth=0, label='2016')
-        ax[0, 1].set_xlabel("Relative Humidity (%)", color='white')
-        ax[0, 1].set_ylabel("Frequency Density", color='white')
-        ax[0, 1].grid(color='white', alpha=0.4, linestyle='--')
-        ax[0,1].set_xticklabels([0,20,40,60,80,100])
-        ax[0,1].set_xlim(0,10)
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        ax[0, 1].set_facecolor('#121212')
-        plt.gca().legend(loc='upper right')
-        plt.subplot(223)  # Cumulative Wind power produced per year
-        plt.title('Cumulative Solar Power Produced', color='white')
-        ax[1, 0].plot(Solarpower[:,0], color='#2CBDFE', label='2013')
-        ax[1, 0].plot(Solarpower[:,1], color='#5986E4', label='2014')
-        ax[1, 0].plot(Solarpower[:,2], color='#8D46C7', label='2015')
-        ax[1, 0].plot(Solarpower[:,3], color='#B317B1', label='2016')
-        ax[1, 0].set_xlabel("Hours in Year", color='white')
-        ax[1, 0].set_ylabel("Cumulative Wind Power Generated (MWh)", color='white')
-        #plt.gca().yaxis.set_major_formatter(ticker.ScalarFormatter())
-        #plt.gca().yaxis.set_major_formatter(ticker.StrMethodFormatter("{x}"))
-        #ax[1, 0].set_yticklabels(plt.yticks()[0].astype(int))  # Removes decimal from number
-        ax[1, 0].grid(color='white', alpha=0.15, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        plt.gca().legend(loc='upper left')
-        ax[1, 0].set_facecolor('#121212')
-        plt.subplot(224)  # Cumulative Wind power produced per year
-        plt.title('Cumulative Hydrogen Electrolyzed', color='white')
-        ax[1, 1].plot(SolarH2Avg, color='#018786')
-        plt.fill_between(np.arange(0, SolarH2Avg.shape[0]), SolarH2Avg - 2*SolarH2StdDev, SolarH2Avg + 2*SolarH2StdDev, color="#03DAC6", alpha = 0.15) #This creates std dev
-        ax[1, 1].set_xlabel("Hours in Year", color='white')
-        ax[1, 1].set_ylabel("Cumulative Hydrogen Generated (tonnes)", color='white')
-        #plt.gca().yaxis.set_major_formatter(ticker.ScalarFormatter())
-        #plt.gca().yaxis.set_major_formatter(ticker.StrMethodFormatter("{x}"))
-        #ax[1, 1].set_yticklabels(plt.yticks()[0].astype(int))  # Removes decimal from number
-        ax[1, 1].grid(color='white', alpha=0.15, linestyle='--')
-        plt.xticks(color='white')
-        plt.yticks(color='white')
-        ax[1, 1].set_facecolor('#121212')
-
-        canvas = FigureCanvasTkAgg(fig, master=root) #These are necessary to actually render Matplotlib graphs
-        canvas.draw()
-        canvas.get_tk_widget().place(relx=0.15, rely=0.0)
+        # Perform calculations for Solarpower and H2 evolution on a worker thread (see H2AppEngine for the leap year handling)
+        # The page is calculated for 1m2 at 100% and scaled, so other panel parameters are drawn straight away
+        timer.Lap("banner")
+        PageCache.SetDataVersion(Weather.Version())
+        self.StartPageJob(("Solar", cityNum),
+                          lambda job: self.ComputeSolarPage(job, cityNum, timer),
+                          lambda Results: self.RenderSolarPage(cityName, Results, PanelArea, Efficiency, timer))
+
+    def ComputeSolarPage(self, job, cityNum, timer):
+        with Profiled("solar-" + str(cityNum) + "-compute"):
+            return SolarPageResults(Weather, [cityNum], timer, job)
+
+    def RenderSolarPage(self, cityName, Results, PanelArea, Efficiency, timer):
+        with Profiled("solar-" + cityName + "-render"):
+            with timer.Phase("scale"):
+                Results = ScaleResults(Results, SolarScale(PanelArea, Efficiency), fixed=SOLAR_WEATHER)
+            figure, canvas = self.PageCanvas("Solar", SolarFigure)
+            figure.Update(cityName, Weather.Years(), Results, timer) # Times its own lines / distribution / band phases
+            with timer.Phase("draw"):
+                canvas.draw()
+            canvas.get_tk_widget().place(relx=0.15, rely=0.0)
+        self.ShowTimings(timer, column=1)
 
 # Driver Code
-root = ctk.CTk()
-app = App(root)
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    ConfigureTimingLog() # Phase timings go to $H2APP_TIMING_LOG when it is set
+    root = ctk.CTk()
+    app = App(root)
+    root.mainloop()
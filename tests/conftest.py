@@ -0,0 +1,31 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from H2AppData import WeatherData
+from H2AppSynthetic import MakeSyntheticWeather
+
+# One small synthetic weather.sqlite (Kelvin temperatures, like the real dataset) shared by every test
+TEST_CITIES, TEST_YEARS = 4, 2
+
+
+@pytest.fixture(scope="session")
+def database(tmp_path_factory):
+    return MakeSyntheticWeather(str(tmp_path_factory.mktemp("weather") / "weather.sqlite"), TEST_CITIES, 2015, TEST_YEARS)
+
+@pytest.fixture(scope="session")
+def cache_dir(tmp_path_factory):
+    return str(tmp_path_factory.mktemp("cache"))
+
+@pytest.fixture(scope="session")
+def weather(database, cache_dir):
+    with WeatherData(database, cache_dir) as Weather:
+        yield Weather
+
+@pytest.fixture(scope="session")
+def weather_sqlite(database):
+    with WeatherData(database, None) as Weather:
+        yield Weather
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from H2AppEngine import BootstrapBands, Cumulate
+
+
+@pytest.mark.parametrize("block, hours", [("day", 24), ("week", 168)])
+def test_one_year_gives_that_year(block, hours):
+    Lengths = np.array([8760])
+    Cumulative = Cumulate(np.random.default_rng(3).gamma(1.5, size=(8760, 3, 1)), Lengths)
+    Bands = BootstrapBands(Cumulative, Lengths, block, samples=50)
+    ends = np.append(np.arange(hours, 8760, hours), 8760) - 1 # Last hour of every block, the last one cut short
+    np.testing.assert_array_equal(Bands["hours"], ends)
+    for p in ("P10", "P50", "P90"): # Every synthetic year is the one real year
+        np.testing.assert_allclose(Bands[p], Cumulative[ends, :, 0], rtol=1e-12)
+
+def test_identical_years_give_no_spread():
+    Lengths = np.array([8760, 8784, 8760])
+    Year = np.random.default_rng(4).gamma(1.5, size=(8784, 2))
+    Cumulative = Cumulate(np.repeat(Year[:, :, None], 3, axis=2), Lengths)
+    Bands = BootstrapBands(Cumulative, Lengths, "week", samples=200)
+    assert Bands["hours"][-1] == 8759 # Synthetic years are as long as the shortest year
+    for p in ("P10", "P50", "P90"):
+        np.testing.assert_allclose(Bands[p], Cumulative[Bands["hours"], :, 0], rtol=1e-12)
+
+def test_constant_power_gives_a_straight_line():
+    Lengths = np.array([8784, 8760])
+    Cumulative = Cumulate(np.full((8784, 1, 2), 0.25), Lengths)
+    Bands = BootstrapBands(Cumulative, Lengths, "day", samples=100)
+    for p in ("P10", "P50", "P90"): # 0.25 every hour after hour 0
+        np.testing.assert_allclose(Bands[p][:, 0], 0.25*Bands["hours"], rtol=1e-12)
@@ -0,0 +1,42 @@
+import numpy as np
+
+from H2AppCache import ResultCache, ResultBytes
+
+
+def Result(kb):
+    return {"Windpower": np.zeros(kb*64), "WindH2": [np.zeros(kb*32), np.zeros(kb*32)]} # kb KiB of float64
+
+def test_least_recently_used_is_evicted():
+    cache = ResultCache(max_bytes=3*1024)
+    for city in range(3):
+        cache.Put((city, 80, 60), Result(1))
+    assert cache.Get((0, 80, 60)) is not None # City 0 is now the most recently used
+    cache.Put((3, 80, 60), Result(1))
+    assert (1, 80, 60) not in cache and all(key in cache for key in [(0, 80, 60), (2, 80, 60), (3, 80, 60)])
+    assert cache.Stats() == {"entries": 3, "bytes": 3*1024, "max_bytes": 3*1024, "hits": 1, "misses": 0}
+
+def test_byte_budget():
+    cache = ResultCache(max_bytes=4*1024)
+    assert ResultBytes(Result(2)) == 2*1024
+    cache.Put("a", Result(2))
+    cache.Put("b", Result(2))
+    cache.Put("a", Result(1)) # Replacing an entry gives back its bytes, nothing is evicted
+    assert len(cache) == 2 and cache.nbytes == 3*1024
+    cache.Put("c", Result(3)) # "b" is now the oldest and goes, the replaced "a" still fits
+    assert list(cache.entries) == ["a", "c"] and cache.nbytes == 4*1024
+    cache.Put("d", Result(5)) # Bigger than the whole budget: handed back but not cached
+    assert list(cache.entries) == ["a", "c"] and cache.nbytes == 4*1024
+
+def test_new_data_version_invalidates():
+    cache = ResultCache(data_version=("weather.sqlite", 1))
+    calls = []
+    compute = lambda: calls.append(1) or Result(1)
+    cache.GetOrCompute("page", compute)
+    cache.GetOrCompute("page", compute)
+    cache.SetDataVersion(("weather.sqlite", 1)) # Same data, kept
+    cache.GetOrCompute("page", compute)
+    assert len(calls) == 1
+    cache.SetDataVersion(("weather.sqlite", 2))
+    assert len(cache) == 0 and cache.nbytes == 0
+    cache.GetOrCompute("page", compute)
+    assert len(calls) == 2 and cache.data_version == ("weather.sqlite", 2)
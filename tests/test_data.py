@@ -0,0 +1,55 @@
+import os
+import threading
+
+import numpy as np
+
+from H2AppData import BuildBinaryCache, CacheIsCurrent, WeatherData
+
+
+#-- Hold the WeatherData lock on another thread (as a page job loading from SQLite would) while fn runs --
+def WhileLocked(Weather, fn, timeout=5):
+    held, release, done = threading.Event(), threading.Event(), threading.Event()
+
+    def hold():
+        with Weather.lock:
+            held.set()
+            release.wait(timeout)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    held.wait(timeout)
+    caller = threading.Thread(target=lambda: (fn(), done.set()))
+    caller.start()
+    caller.join(timeout)
+    release.set()
+    holder.join()
+    return done.is_set()
+
+
+def test_lookups_do_not_wait_for_a_loading_page(weather):
+    Expected = weather.Series("windspeed", [1])
+    assert WhileLocked(weather, lambda: (weather.Cities(), weather.Years(), weather.Index(), weather.Version()))
+    # The binary cache is sliced without the lock
+    assert WhileLocked(weather, lambda: np.testing.assert_array_equal(weather.Series("windspeed", [1]), Expected))
+
+def test_sqlite_lookups_do_not_wait_once_loaded(weather_sqlite):
+    weather_sqlite.Cities(), weather_sqlite.Years(), weather_sqlite.Index() # Loaded at startup by the app
+    assert WhileLocked(weather_sqlite, lambda: (weather_sqlite.Cities(), weather_sqlite.Years(), weather_sqlite.Index(), weather_sqlite.Version()))
+
+def test_concurrent_cache_builds(database, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    errors = []
+    def build():
+        try:
+            BuildBinaryCache(database, cache_dir)
+        except Exception as ex:
+            errors.append(ex)
+    builders = [threading.Thread(target=build) for _ in range(3)]
+    for builder in builders:
+        builder.start()
+    for builder in builders:
+        builder.join()
+    assert errors == []
+    assert CacheIsCurrent(database, cache_dir)
+    assert not [name for name in os.listdir(cache_dir) if ".tmp" in name] # No temporary files left behind
+    np.testing.assert_array_equal(WeatherData(database, cache_dir).Series("windspeed", [0]), WeatherData(database, None).Series("windspeed", [0]))
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from H2AppData import TimeIndex, DATETIME_COLS
+from H2AppEngine import DensityTables, YearRows
+
+
+def DensityInputs():
+    Index = TimeIndex(np.repeat([[2015], [2016]], [2000, 2500], axis=0)*np.ones(DATETIME_COLS, dtype=int))
+    rng = np.random.default_rng(2)
+    Series = np.concatenate([rng.gamma(2.0, 2.5, size=(2, 2000)), rng.normal(60, 15, size=(2, 2500))], axis=1)
+    Series[0, rng.integers(0, 4500, 300)] = np.nan # Missing hours are left out
+    return Series, Index
+
+#-- Exact Gaussian KDE of one row on the grid, Scott's rule bandwidth --
+def DirectKDE(values, grid):
+    values = values[~np.isnan(values)]
+    bandwidth = values.std(ddof=1)*len(values)**(-1/5)
+    return np.exp(-0.5*((grid[:, None] - values[None, :])/bandwidth)**2).sum(axis=1)/(len(values)*bandwidth*np.sqrt(2*np.pi))
+
+def test_density_matches_a_direct_kde():
+    Series, Index = DensityInputs()
+    Tables = DensityTables(Series, Index)
+    Rows = YearRows(Series, Index)
+    for c in range(2):
+        for y in range(2):
+            Expected = DirectKDE(Rows[c, y], Tables["grid"])
+            np.testing.assert_allclose(Tables["density"][c, y], Expected, rtol=0, atol=0.005*Expected.max()) # Linear binning error
+            np.testing.assert_allclose(Tables["density"][c, y].sum()*(Tables["grid"][1] - Tables["grid"][0]), 1, atol=1e-3)
+    np.testing.assert_allclose(Tables["median"], np.nanmedian(Rows, axis=-1))
+
+def test_density_matches_scipy_gaussian_kde():
+    stats = pytest.importorskip("scipy.stats")
+    Series, Index = DensityInputs()
+    Tables = DensityTables(Series, Index)
+    for c, y in ((0, 0), (1, 1)):
+        values = YearRows(Series, Index)[c, y]
+        Expected = stats.gaussian_kde(values[~np.isnan(values)], bw_method="scott")(Tables["grid"])
+        np.testing.assert_allclose(Tables["density"][c, y], Expected, rtol=0, atol=0.005*Expected.max())
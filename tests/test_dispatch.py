@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+
+from H2AppData import TimeIndex, DATETIME_COLS
+from H2AppEngine import SolarHourly, Dispatch, DispatchSummary, HourlySummary
+from H2AppSweep import RunSweep
+
+
+def SolarPower(Weather, PanelArea, Efficiency):
+    cities = list(range(Weather.Cities().shape[0]))
+    Latitudes = Weather.Cities().iloc[:, 2].to_numpy(dtype=float)
+    return SolarHourly(*(Weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity")),
+                       Latitudes, Weather.Index(), PanelArea, Efficiency, Weather.ClearSky(cities))
+
+
+def test_solar_hourly_is_mwh(weather):
+    # 1 m2 at 20% can't give more than 1.2 x 1353 W/m2 x 1.33 (closest to the sun) x 0.2 in an hour
+    Hourly = SolarPower(weather, 1, 0.2)
+    assert 0 < np.nanmax(Hourly) <= 1.2*1353*1.33*0.2/1e6
+
+def test_small_panel_never_fills_electrolyzer(weather):
+    Hourly = SolarPower(weather, 1, 0.2)
+    Summary = DispatchSummary(Dispatch(Hourly, weather.Index(), [2.0]), weather.Index(), [2.0])
+    assert np.all(Summary["Curtailment"] == 0)
+    assert np.all(Summary["CapacityFactor"] < 1e-3)
+    Summary = DispatchSummary(Dispatch(Hourly, weather.Index(), [2.0], 0.5), weather.Index(), [2.0])
+    assert np.all(Summary["OperatingHours"] == 0) # Never reaches the 1 MW turndown, so all of it is curtailed
+    assert np.all(Summary["Curtailment"] == 1)
+
+def test_unlimited_electrolyzer_matches_solar_summary(weather):
+    Hourly = SolarPower(weather, 20000, 0.2)
+    Summary = DispatchSummary(Dispatch(Hourly, weather.Index(), [np.inf]), weather.Index(), [np.inf])
+    np.testing.assert_allclose(Summary["AnnualH2"][0], HourlySummary(Hourly, weather.Index())["AnnualH2"], rtol=1e-9)
+
+def test_solar_electrolyzer_sweep(database, cache_dir):
+    grid = {"Area": [20000], "Efficiency": [20]}
+    Solar = RunSweep("solar", grid, database, cache_dir, processes=1).set_index("City")
+    Small = RunSweep("electrolyzer", dict(grid, Capacity=[1000.0], MinLoad=[0.0], Battery=[0.0]), database, cache_dir, processes=1).set_index("City")
+    np.testing.assert_allclose(Small["AnnualMWh"], Solar.loc[Small.index, "AnnualMWh"], rtol=1e-6)
+    assert np.all(Small["Curtailment"] == 0)
+    Tight = RunSweep("electrolyzer", dict(grid, Capacity=[0.2], MinLoad=[0.0], Battery=[0.0]), database, cache_dir, processes=1)
+    assert np.all((Tight["Curtailment"] > 0) & (Tight["CapacityFactor"] <= 1))
+
+#-- One electrolyzer and battery hour by hour in plain Python: load, hours, curtailed of one year --
+def BatteryReference(Power, capacity, min_load, battery_mwh, rate, efficiency=0.9):
+    charge = load = hours = curtailed = 0.0
+    for P in Power[1:]: # Hour 0 is skipped
+        direct = min(P, capacity)
+        stored = min(P - direct, rate, (battery_mwh - charge)/efficiency)
+        discharged = min(capacity - direct, rate, charge)
+        if direct + discharged < min_load*capacity: # Off, its share charges the battery
+            stored = min(direct, rate, (battery_mwh - charge)/efficiency)
+            direct = discharged = 0.0
+        charge += efficiency*stored - discharged
+        load += direct + discharged
+        hours += direct + discharged > 0
+        curtailed += P - direct - stored
+    return load, hours, curtailed
+
+@pytest.mark.parametrize("min_load, battery_mwh, battery_mw", [(0.0, 5.0, None), (0.4, 5.0, None), (0.4, 20.0, 0.5), (0.95, 3.0, None)])
+def test_battery_dispatch_matches_hour_by_hour(min_load, battery_mwh, battery_mw):
+    rng = np.random.default_rng(3)
+    lengths = [8760, 8784]
+    Index = TimeIndex(np.concatenate([np.full((n, DATETIME_COLS), year) for year, n in zip((2015, 2016), lengths)]))
+    Hourly = rng.gamma(0.6, 1.5, size=(2, len(Index)))
+    capacities = [1.0, 2.5]
+    Totals = Dispatch(Hourly, Index, capacities, min_load, battery_mwh, battery_mw)
+    for s, capacity in enumerate(capacities):
+        for c in range(2):
+            for y, (start, n) in enumerate(zip(Index.starts, lengths)):
+                Expected = BatteryReference(Hourly[c, start:start + n], capacity, min_load, battery_mwh, capacity if battery_mw is None else battery_mw)
+                np.testing.assert_allclose([Totals[key][s, c, y] for key in ("Load", "Hours", "Curtailed")], Expected, rtol=1e-9, atol=1e-9)
+
+def test_unlimited_electrolyzer_has_no_minimum_load(weather):
+    Hourly = SolarPower(weather, 1, 0.2)
+    with pytest.raises(ValueError):
+        Dispatch(Hourly, weather.Index(), [np.inf], 0.1)
+    Totals = Dispatch(Hourly, weather.Index(), [np.inf], 0.0, 5.0) # Nothing is ever stored or curtailed
+    np.testing.assert_allclose(Totals["Load"], Totals["Power"], rtol=1e-12)
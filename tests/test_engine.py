@@ -0,0 +1,113 @@
+import numpy as np
+
+from H2AppEngine import WindResults, SolarResults, WindHourly, YearBlocks, WindPageResults, SolarPageResults, HOUR_COL
+from H2AppEngine import ScaleResults, WindScale, SolarScale, ResultRollups, ResultBands, HourlySummary, Rollups
+from H2AppEngine import WIND_ROLLUPS, SOLAR_ROLLUPS, WIND_WEATHER, SOLAR_WEATHER, SolarHourly
+from H2AppFunctions import P_wind, P_solar, H2Prod, KirmaniEff
+
+
+def test_cumulative_results_keep_the_hourly_steps(weather):
+    Windspeed, Index = weather.Series("windspeed", [0, 1]), weather.Index()
+    assert Windspeed.dtype == np.float32 # Stored weather stays compact
+    Results = WindResults(Windspeed, Index, 80, 60)
+    assert all(value.dtype == np.float64 for value in Results.values())
+    Hourly = YearBlocks(WindHourly(Windspeed, 80, 60), Index)
+    Steps = np.diff(Results["Windpower"], axis=0)
+    for y, n in enumerate(Index.lengths): # Hour 0 is skipped
+        np.testing.assert_allclose(Steps[:n - 1, :, y], Hourly[1:n, :, y], rtol=1e-9, atol=1e-9)
+
+class CancelledJob:
+    def __init__(self):
+        self.progress = []
+
+    def Progress(self, fraction):
+        self.progress.append(fraction)
+
+    def Cancelled(self):
+        return True
+
+def test_page_results_of_one_city_and_of_all(weather):
+    All = WindPageResults(weather, [0, 1, 2], 80)
+    One = WindPageResults(weather, [1], 80)
+    for key in ("Windpower", "WindH2", "WindH2Avg", "Windspeed"):
+        np.testing.assert_array_equal(One[key], All[key][:, 1:2])
+    job = CancelledJob()
+    assert SolarPageResults(weather, [1], job=job) is None
+    assert job.progress == [0.25, 0.5, 0.75]
+
+#-- The original page loops for one city, for any number of years: scalar functions, hour 0 skipped, shorter years and
+# the average / std dev carried forward past the end of the shortest year --
+def PageLoops(HourlyPower, Index):
+    hours = max(Index.lengths)
+    Power, H2 = np.zeros([hours, len(Index.years)]), np.zeros([hours, len(Index.years)])
+    H2Avg, H2StdDev = np.zeros(hours), np.zeros(hours)
+    for y, (start, n) in enumerate(zip(Index.starts, Index.lengths)):
+        for i in range(1, hours):
+            if i < n:
+                Power[i, y] = Power[i - 1, y] + HourlyPower(start + i)
+                H2[i, y] = H2[i - 1, y] + H2Prod(Power[i, y] - Power[i - 1, y])
+            else:
+                Power[i, y], H2[i, y] = Power[i - 1, y], H2[i - 1, y]
+    for i in range(1, hours):
+        if i < min(Index.lengths):
+            H2Avg[i] = sum(H2[i])/len(Index.years)
+            H2StdDev[i] = np.sqrt(sum((h - H2Avg[i])**2 for h in H2[i])/len(Index.years))
+        else:
+            H2Avg[i], H2StdDev[i] = H2Avg[i - 1], H2StdDev[i - 1]
+    return Power, H2, H2Avg, H2StdDev
+
+def AssertLoopsMatch(Results, name, Loops):
+    for key, expected in zip(("power", "H2"), Loops[:2]):
+        np.testing.assert_allclose(Results[name + key][:, 0, :], expected, rtol=1e-9, atol=1e-12)
+    for key, expected in zip(("H2Avg", "H2StdDev"), Loops[2:]):
+        np.testing.assert_allclose(Results[name + key][:, 0], expected, rtol=1e-9, atol=1e-9)
+
+def test_engine_matches_the_original_page_loops(weather):
+    Index = weather.Index()
+    assert len(set(Index.lengths)) > 1 # A leap year, so the carrying forward is covered
+    Windspeed, Temperature, Humidity = (weather.Series(table, [2]) for table in ("windspeed", "temperature", "humidity"))
+    Wind = PageLoops(lambda h: P_wind(60, 80, float(Windspeed[0, h]))/1000000, Index)
+    AssertLoopsMatch(WindResults(Windspeed, Index, 80, 60), "Wind", Wind)
+
+    latitude = float(weather.Cities().iat[2, 2])
+    HourOfYear, Hour = Index.HourOfYear(), Index.datetimes[:, HOUR_COL]
+    Solar = PageLoops(lambda h: (0.2*1000*P_solar(latitude, int(HourOfYear[h]/24) + 1, int(Hour[h]))/1000)
+                      * KirmaniEff(float(Windspeed[0, h])*3.6, float(Temperature[0, h]), float(Humidity[0, h]))/1000, Index) # kWh -> MWh
+    AssertLoopsMatch(SolarResults(Windspeed, Temperature, Humidity, [latitude], Index, 1000, 0.2), "Solar", Solar)
+
+def AssertSameResults(Scaled, Direct):
+    assert set(Scaled) == set(Direct)
+    for key, value in Direct.items():
+        if isinstance(value, Rollups):
+            for level, stats in value.levels.items():
+                AssertSameResults(Scaled[key].levels[level], stats)
+        elif isinstance(value, dict): # Density curves
+            AssertSameResults(Scaled[key], value)
+        else:
+            np.testing.assert_allclose(Scaled[key], value, rtol=1e-9, atol=1e-9, err_msg=key) # Only the rounding of the sums differs
+
+#-- A city page worked out directly for the given radius / panel, with the weather results of the scale 1 page --
+def DirectPage(Base, Results, name, keys, fixed, Index):
+    Results.update({key: Base[key] for key in fixed})
+    Results.update(ResultRollups(Results, Index, keys))
+    Results.update(ResultBands(Results, name, Index.lengths))
+    return Results
+
+def test_scaled_pages_match_direct_recalculation(weather):
+    cities, Index = [0, 3], weather.Index()
+    Windspeed, Temperature, Humidity = (weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity"))
+    Latitudes = weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+
+    Base = WindPageResults(weather, cities, 80)
+    Direct = DirectPage(Base, WindResults(Windspeed, Index, 80, 45), "Wind", WIND_ROLLUPS, WIND_WEATHER, Index)
+    AssertSameResults(ScaleResults(Base, WindScale(45), fixed=WIND_WEATHER), Direct)
+
+    Base = SolarPageResults(weather, cities)
+    Direct = DirectPage(Base, SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, 2500, 0.18), "Solar",
+                        SOLAR_ROLLUPS, SOLAR_WEATHER, Index)
+    AssertSameResults(ScaleResults(Base, SolarScale(2500, 0.18), fixed=SOLAR_WEATHER), Direct)
+
+    # Map marker summaries, the variability is a ratio and stays the same
+    Base = HourlySummary(SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, 1, 1), Index)
+    Direct = HourlySummary(SolarHourly(Windspeed, Temperature, Humidity, Latitudes, Index, 2500, 0.18), Index)
+    AssertSameResults(ScaleResults(Base, SolarScale(2500, 0.18)), Direct)
@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from H2AppExport import Export, main
+from H2AppFunctions import P_wind, P_solar, KirmaniEff, H2Prod
+from H2AppSweep import RunSweep
+
+CITIES = ["0", "1"]
+
+
+#-- Exported rows after hour 0 next to the weather of the same city and hour --
+def ExportedHours(table, weather):
+    names = list(weather.Cities().iloc[:, 0])
+    Index = weather.Index()
+    Hours = []
+    for name, rows in table.groupby("City", sort=False):
+        c = names.index(name)
+        Weather = {t: weather.Series(t, [c])[0] for t in ("windspeed", "temperature", "humidity")}
+        rows = rows[rows["HourOfYear"] > 0]
+        position = Index.starts[[Index.years.index(year) for year in rows["Year"]]] + rows["HourOfYear"].to_numpy()
+        Hours.append(rows.assign(Latitude=weather.Cities().iat[c, 2], **{t: values[position] for t, values in Weather.items()}))
+    return pd.concat(Hours)
+
+def test_wind_export_matches_scalar_functions(database, cache_dir, weather, tmp_path):
+    output = str(tmp_path / "wind.csv")
+    Export("wind", output, CITIES, None, {"height": 100, "radius": 50}, database=database, cache_dir=cache_dir)
+    table = ExportedHours(pd.read_csv(output), weather)
+    Expected = [P_wind(50, 100, float(v))/1000000 for v in table["windspeed"]]
+    np.testing.assert_allclose(table["Power_MWh"], Expected, rtol=1e-12)
+    np.testing.assert_allclose(table["H2_t"], [H2Prod(p) for p in Expected], rtol=1e-12)
+
+def test_solar_export_matches_scalar_functions(database, cache_dir, weather, tmp_path):
+    output = str(tmp_path / "solar.csv")
+    Export("solar", output, CITIES, None, {"area": 20000, "efficiency": 20}, database=database, cache_dir=cache_dir)
+    table = ExportedHours(pd.read_csv(output), weather)
+    Expected = [0.2*20000*P_solar(lat, hour//24 + 1, h)/1000*KirmaniEff(float(ws)*3.6, float(t), float(rh))/1000
+                for lat, hour, h, ws, t, rh in table[["Latitude", "HourOfYear", "Hour", "windspeed", "temperature", "humidity"]].itertuples(index=False)]
+    np.testing.assert_allclose(table["Power_MWh"], Expected, rtol=1e-9, atol=1e-15)
+    np.testing.assert_allclose(table["H2_t"], [H2Prod(p) for p in Expected], rtol=1e-9, atol=1e-15)
+
+    # A year of hourly power adds up to the sweep's annual MWh (hour 0 is skipped by both)
+    Annual = table.groupby(["City", "Year"])["Power_MWh"].sum().groupby("City").mean()
+    Sweep = RunSweep("solar", {"Area": [20000], "Efficiency": [20]}, database, cache_dir, processes=1).set_index("City")
+    np.testing.assert_allclose(Annual, Sweep.loc[Annual.index, "AnnualMWh"], rtol=1e-9)
+
+def test_failed_parquet_export_is_closed(database, cache_dir, tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import H2AppExport
+    Chunk, calls = H2AppExport.ExportChunk, []
+    def ExportChunk(*args): # The second chunk fails
+        if calls:
+            raise RuntimeError("chunk failed")
+        calls.append(args)
+        return Chunk(*args)
+    monkeypatch.setattr(H2AppExport, "ExportChunk", ExportChunk)
+    output = str(tmp_path / "wind.parquet")
+    with pytest.raises(RuntimeError):
+        Export("wind", output, CITIES, chunk_cities=1, database=database, cache_dir=cache_dir)
+    # The first chunk was written and the file closed, so it can be read back
+    assert set(pd.read_parquet(output)["City"]) == {"City001"}
+
+def test_no_cache_option(database, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    main(["wind", "--output", "wind.csv", "--cities", "0", "--database", database, "--no-cache"])
+    assert os.listdir(tmp_path) == ["wind.csv"] # Read from SQLite, no cache directory made
@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from H2AppFunctions import P_wind, P_solar, H2Prod, KirmaniEff
+from H2AppFunctions import P_wind_array, P_solar_array, H2Prod_array, KirmaniEff_array
+
+
+@pytest.mark.parametrize("radius, height", [(60, 80), (30, 120), (1, 10)])
+def test_wind_array_matches_scalar(radius, height):
+    Velocity = np.array([0, 0.5, 2.9, 3, 7.25, 12, 24.9, 25, 26, 40])
+    Expected = [P_wind(radius, height, float(v)) for v in Velocity]
+    np.testing.assert_allclose(P_wind_array(radius, height, Velocity), Expected, rtol=1e-14, atol=0)
+
+@pytest.mark.filterwarnings("ignore::RuntimeWarning") # arccos of the polar day/night latitudes in P_solar
+@pytest.mark.parametrize("latitude", [-45, 0, 25.8, 47.6, 71.3])
+def test_solar_array_matches_scalar(latitude):
+    DOY, Hour = np.meshgrid(np.arange(1, 367, 5), np.arange(24), indexing="ij")
+    Expected = [[P_solar(latitude, int(d), int(h)) for d, h in zip(days, hours)] for days, hours in zip(DOY, Hour)]
+    np.testing.assert_allclose(P_solar_array(latitude, DOY, Hour), Expected, rtol=1e-12, atol=1e-9)
+
+def test_h2_and_kirmani_arrays_match_scalar():
+    Power = np.array([0, 0.001, 1.5, 2000])
+    np.testing.assert_allclose(H2Prod_array(Power), [H2Prod(float(p)) for p in Power], rtol=1e-15)
+    Speed, Temp, RH = np.meshgrid([0, 10, 36, 100], [-20, 0, 25, 40], [0, 50, 100], indexing="ij")
+    Expected = np.reshape([KirmaniEff(float(s), float(t), float(h)) for s, t, h in zip(Speed.ravel(), Temp.ravel(), RH.ravel())], Speed.shape)
+    np.testing.assert_allclose(KirmaniEff_array(Speed, Temp, RH), Expected, rtol=1e-14, atol=1e-15)
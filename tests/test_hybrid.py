@@ -0,0 +1,33 @@
+import numpy as np
+
+from H2AppData import TimeIndex, DATETIME_COLS
+from H2AppEngine import HybridSummary
+from H2AppSweep import RunSweep
+
+
+def test_capacity_factor_uses_rated_capacity():
+    Index = TimeIndex(np.full((5, DATETIME_COLS), 2015)) # One year of 5 hours
+    Wind = np.array([[0, 1, 1, 1, 1]], dtype=float)
+    Solar = np.array([[0, 0, 1, 0, 0]], dtype=float)
+    Summary = HybridSummary(Wind, Solar, Index)
+    assert "CapacityFactor" not in Summary
+    np.testing.assert_allclose(Summary["PeakRatio"], 5/8) # 5 MWh over 4 hours at the 2 MW peak
+    np.testing.assert_allclose(HybridSummary(Wind, Solar, Index, 4)["CapacityFactor"], 5/16)
+
+def test_hybrid_sweep_rated_column(database, cache_dir):
+    grid = {"Height": [80], "Radius": [30], "Area": [1000], "Efficiency": [20]}
+    table = RunSweep("hybrid", grid, database, cache_dir, processes=1)
+    assert "CapacityFactor" not in table and np.all(table["PeakRatio"] <= 1)
+    table = RunSweep("hybrid", dict(grid, Rated=[1e6]), database, cache_dir, processes=1)
+    np.testing.assert_allclose(table["CapacityFactor"], table["AnnualMWh"]/(1e6*8759), rtol=1e-2) # Leap years have 24 more hours
+
+def test_fused_hourly_matches_separate(weather, monkeypatch):
+    import H2AppEngine
+    from H2AppEngine import HybridHourly, WindHourly, SolarHourly
+    monkeypatch.setattr(H2AppEngine, "HYBRID_CHUNK", 3) # A chunk of 3 and the last city on its own
+    cities = list(range(weather.Cities().shape[0]))
+    Windspeed, Temperature, Humidity = (weather.Series(name, cities) for name in ("windspeed", "temperature", "humidity"))
+    Latitudes = weather.Cities().iloc[:, 2].to_numpy(dtype=float)
+    Wind, Solar = HybridHourly(Windspeed, Temperature, Humidity, Latitudes, weather.Index(), 80, 30, 1000, 0.2)
+    np.testing.assert_array_equal(Wind, WindHourly(Windspeed, 80, 30))
+    np.testing.assert_array_equal(Solar, SolarHourly(Windspeed, Temperature, Humidity, Latitudes, weather.Index(), 1000, 0.2))
@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+from PIL import Image, PdfParser
+
+from H2AppEngine import SolarPageResults
+from H2AppReport import Report, ReportPath, REPORT_PDF
+
+
+def test_report_pngs_and_pdf(database, cache_dir, tmp_path):
+    output = str(tmp_path / "report")
+    paths = Report(output, cities=["0", "1"], processes=2, database=database, cache_dir=cache_dir)
+    assert [os.path.basename(path) for path in paths] == ["wind_City001.png", "solar_City001.png", "wind_City002.png", "solar_City002.png"]
+    for path in paths:
+        with Image.open(path) as image:
+            assert image.size[0] > 1000
+    pdf = PdfParser.PdfParser(os.path.join(output, REPORT_PDF)) # Read back with a PDF parser, one page per PNG
+    try:
+        assert len(pdf.pages) == len(paths)
+    finally:
+        pdf.close()
+
+def test_failed_report_leaves_no_pdf(database, cache_dir, tmp_path):
+    output = str(tmp_path / "report")
+    os.makedirs(ReportPath(output, "solar", "City001")) # The page can't be saved over a directory
+    with pytest.raises(OSError):
+        Report(output, cities=["0", "1"], processes=1, database=database, cache_dir=cache_dir)
+    assert not os.path.exists(os.path.join(output, REPORT_PDF))
+
+def test_nothing_to_render(database, cache_dir, tmp_path):
+    with pytest.raises(ValueError):
+        Report(str(tmp_path / "report"), pages=[], database=database, cache_dir=cache_dir)
+
+def test_solar_pages_not_negative(weather):
+    Results = SolarPageResults(weather, [0, 1])
+    for key in ("Solarpower", "SolarH2", "SolarH2Avg", "SolarIrradianceWithWeather", "SolarH2P10"):
+        assert np.nanmin(Results[key]) >= 0
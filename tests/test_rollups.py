@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from H2AppEngine import Rollups, MONTH_DAYS
+
+
+#-- Bins of one year's hours [hours, cities] through a reshape: whole days, then days grouped by the given day counts --
+def ReshapedBins(Year, stat, day_counts=None):
+    Days = Year.reshape(-1, 24, Year.shape[1]) # [days, 24, cities]
+    if day_counts is None:
+        return {"sum": Days.sum(axis=1), "min": Days.min(axis=1), "max": Days.max(axis=1), "mean": Days.mean(axis=1)}[stat]
+    Bins = np.split(Days, np.cumsum(day_counts)[:-1])
+    return np.array([{"sum": b.sum(axis=(0, 1)), "min": b.min(axis=(0, 1)), "max": b.max(axis=(0, 1)), "mean": b.mean(axis=(0, 1))}[stat] for b in Bins])
+
+@pytest.mark.parametrize("stat", ["sum", "min", "max", "mean"])
+def test_rollups_match_a_reshape(stat):
+    Lengths = np.array([8760, 8784]) # A leap year second
+    Blocks = np.random.default_rng(1).normal(size=(8784, 3, 2))
+    Blocks[8760:, :, 0] = np.nan # Past the end of the shorter year, as YearBlocks pads it
+    Rolled = Rollups(Blocks, Lengths)
+    for y, hours in enumerate(Lengths):
+        Year = Blocks[:hours, :, y]
+        days = hours // 24
+        months = list(MONTH_DAYS)
+        months[1] += days > 365
+        weeks = [7]*(days // 7) + [days % 7] # The last week of the year is cut short
+        for level, day_counts in (("day", None), ("week", weeks), ("month", months)):
+            Expected = ReshapedBins(Year, stat, day_counts)
+            Level = Rolled.levels[level]
+            assert Level["bins"][y] == len(Expected)
+            np.testing.assert_allclose(Level[stat][:len(Expected), :, y], Expected, rtol=1e-12, atol=1e-12)
+            assert np.all(np.isnan(Level[stat][len(Expected):, :, y])) # NaN past the last bin of the shorter year
+            np.testing.assert_array_equal(Level["x"][:len(Expected), y], 24*np.cumsum([0] + (day_counts or [1]*days)[:-1]))
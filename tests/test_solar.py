@@ -0,0 +1,38 @@
+import numpy as np
+
+from H2AppEngine import SolarResults, SolsticeIrradiance
+from H2AppFunctions import KirmaniEff, KirmaniEff_array
+
+
+def SolarInputs(Weather):
+    cities = list(range(Weather.Cities().shape[0]))
+    Latitudes = Weather.Cities().iloc[cities, 2].to_numpy(dtype=float)
+    Windspeed, Temperature, Humidity = (Weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity"))
+    return Windspeed, Temperature, Humidity, Latitudes, Weather.Index(), Weather.ClearSky(cities)
+
+
+def test_temperature_is_celsius(weather, weather_sqlite):
+    for Weather in (weather, weather_sqlite):
+        Temperature = Weather.Series("temperature", [0, 1])
+        assert -60 < np.nanmin(Temperature) and np.nanmax(Temperature) < 60
+    np.testing.assert_allclose(weather.Series("temperature", [0, 1]), weather_sqlite.Series("temperature", [0, 1]), atol=1e-4)
+
+def test_kirmani_is_a_fraction():
+    K = KirmaniEff_array(np.array([0, 20, 100]), np.array([-20, 20, 40]), np.array([10, 60, 100]))
+    assert np.all((K >= 0) & (K <= 1))
+    assert KirmaniEff(100, 40, 100) == 0
+
+def test_solar_power_and_h2_not_negative(weather):
+    Windspeed, Temperature, Humidity, Latitudes, Index, ClearSky = SolarInputs(weather)
+    Results = SolarResults(Windspeed, Temperature, Humidity, Latitudes, Index, 10, 0.2, ClearSky)
+    Lengths = Index.lengths
+    for key in ("Solarpower", "SolarH2"):
+        assert np.nanmin(Results[key]) >= 0
+        Final = np.stack([Results[key][n - 1, :, y] for y, n in enumerate(Lengths)], axis=1)
+        assert np.all(Final > 0)
+
+def test_weather_curve_below_clear_sky(weather):
+    Windspeed, Temperature, Humidity, Latitudes, Index, ClearSky = SolarInputs(weather)
+    Solstice, WithWeather = SolsticeIrradiance(Windspeed, Temperature, Humidity, Latitudes, Index)
+    assert np.all(WithWeather >= 0)
+    assert np.all(WithWeather <= Solstice + 1e-9)
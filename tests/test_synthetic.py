@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from H2AppBenchmark import CheckResults, HEIGHT, RADIUS, AREA, EFFICIENCY
+from H2AppEngine import WindResults, SolarResults, AnnualSummary
+from H2AppFunctions import H2Prod_array
+
+
+def Results(Weather, kelvin=False):
+    cities = list(range(Weather.Cities().shape[0]))
+    Latitudes = Weather.Cities().iloc[:, 2].to_numpy(dtype=float)
+    Windspeed, Temperature, Humidity = (Weather.Series(table, cities) for table in ("windspeed", "temperature", "humidity"))
+    Temperature = Temperature + 273.15 if kelvin else Temperature
+    Wind = WindResults(Windspeed, Weather.Index(), HEIGHT, RADIUS)
+    Solar = SolarResults(Windspeed, Temperature, Humidity, Latitudes, Weather.Index(), AREA, EFFICIENCY, Weather.ClearSky(cities))
+    return Windspeed, Wind, Solar
+
+
+def test_synthetic_results_are_physical(weather):
+    Windspeed, Wind, Solar = Results(weather)
+    CheckResults(Windspeed, Wind, Solar)
+    Summary = AnnualSummary(Solar["Solarpower"], Solar["SolarH2"])
+    assert np.all(Summary["AnnualMWh"] > 0)
+    np.testing.assert_allclose(Summary["AnnualH2"], H2Prod_array(Summary["AnnualMWh"]), rtol=1e-4)
+    Summary = AnnualSummary(Wind["Windpower"], Wind["WindH2"])
+    assert np.all((Summary["AnnualMWh"] > 100) & (Summary["AnnualMWh"] < 1e6)) # A 60 m rotor gives GWh, not kWh or TWh
+
+def test_kelvin_temperatures_are_caught(weather):
+    # Kelvin in the Kirmani correlation clamps the weather factor to 0, so there is no solar power left
+    with pytest.raises(ValueError):
+        CheckResults(*Results(weather, kelvin=True))
@@ -0,0 +1,49 @@
+import threading
+import urllib.request
+
+from H2AppTiles import TileCache, SeedTiles, ServeTiles, FetchTile, PlaceholderTile, TileRange, TILE_SERVER
+
+
+#-- Run the stand-in tile server on a free port while fn(source URL) runs --
+def WhileServing(path, fn):
+    server = ServeTiles(path, port=0)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    try:
+        return fn("http://127.0.0.1:" + str(server.server_address[1]) + "/{z}/{x}/{y}.png")
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def test_seed_then_serve_offline(tmp_path):
+    upstream, seeded = str(tmp_path / "upstream.sqlite"), str(tmp_path / "seeded.sqlite")
+    cache = TileCache(upstream)
+    cache.Put(TILE_SERVER, 1, 1, 0, b"tile 1/1/0")
+    cache.Close()
+
+    saved, failed = WhileServing(upstream, lambda source: SeedTiles(seeded, zoom_max=1, source=source, workers=2))
+    assert (saved, failed) == (len(TileRange(0, 1)), 0)
+
+    # The upstream server is gone: every tile now comes from the seeded cache, under the map widget's tile URL
+    cache = TileCache(seeded)
+    try:
+        assert cache.Missing(TILE_SERVER, 0, 1) == []
+        assert cache.Get(TILE_SERVER, 1, 1, 0) == b"tile 1/1/0"
+        assert cache.Get(TILE_SERVER, 0, 0, 0) == PlaceholderTile()
+    finally:
+        cache.Close()
+    assert WhileServing(seeded, lambda source: FetchTile(source, 1, 1, 0)) == b"tile 1/1/0"
+
+def test_served_content_type_follows_the_tile(tmp_path):
+    path = str(tmp_path / "tiles.sqlite")
+    cache = TileCache(path)
+    cache.Put(TILE_SERVER, 1, 0, 0, b"\xff\xd8\xff\xe0 jpeg tile")
+    cache.Put(TILE_SERVER, 1, 0, 1, PlaceholderTile(grey=0x80)) # A cached PNG
+    cache.Close()
+
+    def ContentTypes(source):
+        urls = [source.format(z=1, x=0, y=y) for y in (0, 1)] + [source.format(z=1, x=1, y=1)] # The last one is not cached
+        return [urllib.request.urlopen(url, timeout=10).headers["Content-Type"] for url in urls]
+    assert WhileServing(path, ContentTypes) == ["image/jpeg", "image/png", "image/png"]